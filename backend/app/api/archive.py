@@ -0,0 +1,51 @@
+import base64
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from backend.app.utils.session_archive import SessionArchive, get_session_archive
+from backend.config import ARCHIVE_SECRET
+
+router = APIRouter(prefix="/internal/archive")
+
+
+def require_archive_secret(
+    x_archive_secret: Optional[str] = Header(None),
+    archive=Depends(get_session_archive)
+) -> SessionArchive:
+    # Only the host that owns the archive file serves it, and only to other hosts
+    if not ARCHIVE_SECRET or not isinstance(archive, SessionArchive):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    if x_archive_secret is None or not hmac.compare_digest(x_archive_secret, ARCHIVE_SECRET):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return archive
+
+
+@router.get("/sessions/{session_id}")
+async def get_archived_session(session_id: str, archive: SessionArchive = Depends(require_archive_secret)):
+    """
+    An archived session's fields and gaze series (base64), for RemoteSessionArchive.
+    """
+    archived = await archive.load(session_id)
+    if archived is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    session, origin, gaze = archived
+    return {
+        "session": session,
+        "gaze_origin": origin,
+        "gaze": base64.b64encode(gaze).decode("ascii") if gaze else None
+    }
+
+
+@router.get("/users/{user_id}/sessions")
+async def list_archived_sessions(
+    user_id: str,
+    before: Optional[float] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    archive: SessionArchive = Depends(require_archive_secret)
+):
+    """
+    One page of a user's archived sessions, newest first, for RemoteSessionArchive.
+    """
+    rows = await archive.list_user_sessions(user_id, before, limit)
+    return [{"session_id": session_id, "score": score, "summary": summary} for session_id, score, summary in rows]
@@ -2,16 +2,18 @@
 
 import uuid
 import json
-import redis
+import redis.asyncio as redis
 
 from fastapi import APIRouter, HTTPException, Depends, status
 from backend.app.models.user_models import UserRegister, UserLogin
 from backend.app.utils.redis_utils import get_redis_connection
-from backend.app.utils.hash_utils import hash_password, check_password
+from backend.app.utils.hash_utils import hash_password_async, check_password_async
 from backend.app.models.user_models import ForgotPassword, ResetPassword
 from backend.app.utils.token_utils import generate_reset_token, hash_token
-from backend.app.utils.mailer import send_password_reset_email
+from backend.app.utils.email_queue import enqueue_email, password_reset_job
 from backend.app.utils.jwt_utils import create_access_token
+from backend.app.utils.user_index import index_user, profile_cache
+from backend.config import RESET_TOKEN_TTL
 from fastapi import Response
 
 router = APIRouter(prefix="/auth")
@@ -29,12 +31,12 @@ async def register_user(
     email_key = f"email:{request.email.lower()}"
 
     # Check if username or email already exists
-    if redis_conn.exists(user_key):
+    if await redis_conn.exists(user_key):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already exists"
         )
-    if redis_conn.exists(email_key):
+    if await redis_conn.exists(email_key):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already in use"
@@ -44,14 +46,17 @@ async def register_user(
     user_data = {
         "user_id": user_id,
         "username": request.username,
-        "password": hash_password(request.password),
+        "password": await hash_password_async(request.password),
         "email": request.email,
         "created_at": request.created_at.isoformat()
     }
 
-    # Save user and email mapping
-    redis_conn.set(user_key, json.dumps(user_data))
-    redis_conn.set(email_key, request.username)
+    # Save user, email mapping and user_id index
+    pipe = redis_conn.pipeline()
+    pipe.set(user_key, json.dumps(user_data))
+    pipe.set(email_key, request.username)
+    index_user(pipe, user_id, request.username)
+    await pipe.execute()
 
 
     access_token = create_access_token({"sub": user_id})
@@ -84,7 +89,7 @@ async def login_user(
     """
     user_key = f"user:{request.username}"
 
-    user_data_raw = redis_conn.get(user_key)
+    user_data_raw = await redis_conn.get(user_key)
     if not user_data_raw:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -94,7 +99,7 @@ async def login_user(
     user_data = json.loads(user_data_raw.decode("utf-8"))
 
     # Check the hashed password
-    if not check_password(user_data["password"], request.password):
+    if not await check_password_async(user_data["password"], request.password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect password"
@@ -126,7 +131,7 @@ async def forgot_password(
     Returns a status code 200 and a JSON message on success.
     """
     email_key = f"email:{request.email.lower()}"
-    username = redis_conn.get(email_key)
+    username = await redis_conn.get(email_key)
     if not username:
       raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
@@ -135,7 +140,7 @@ async def forgot_password(
   
     username = username.decode("utf-8")
     user_key = f"user:{username}"
-    user_data_raw = redis_conn.get(user_key)
+    user_data_raw = await redis_conn.get(user_key)
     if not user_data_raw:
       raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
@@ -144,8 +149,12 @@ async def forgot_password(
 
     token = generate_reset_token()
     hashed_token = hash_token(token)
-    redis_conn.set(f"reset_token:{hashed_token}", username, ex=3600)
-    send_password_reset_email(request.email, token)
+
+    # Delivery happens in the background EmailWorker; the handler only queues the job
+    pipe = redis_conn.pipeline()
+    pipe.set(f"reset_token:{hashed_token}", username, ex=RESET_TOKEN_TTL)
+    enqueue_email(pipe, password_reset_job(request.email), secret=token, secret_ttl=RESET_TOKEN_TTL)
+    await pipe.execute()
     
     user_data = json.loads(user_data_raw.decode("utf-8"))
     return {
@@ -165,7 +174,7 @@ async def reset_password(
     Returns a status code 200 and a JSON message on success.
     """
     hashed_token = hash_token(request.token)
-    username = redis_conn.get(f"reset_token:{hashed_token}")
+    username = await redis_conn.get(f"reset_token:{hashed_token}")
     if not username:
       raise HTTPException(
         status_code=status.HTTP_400_BAD_REQUEST,
@@ -174,7 +183,7 @@ async def reset_password(
     
     username = username.decode("utf-8")
     user_key = f"user:{username}"
-    user_data_raw = redis_conn.get(user_key)
+    user_data_raw = await redis_conn.get(user_key)
     if not user_data_raw:
       raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
@@ -182,9 +191,10 @@ async def reset_password(
       )
     
     user_data = json.loads(user_data_raw.decode("utf-8"))
-    user_data["password"] = hash_password(request.new_password)
-    redis_conn.set(user_key, json.dumps(user_data))
-    redis_conn.delete(f"reset_token:{hashed_token}")
+    user_data["password"] = await hash_password_async(request.new_password)
+    await redis_conn.set(user_key, json.dumps(user_data))
+    await redis_conn.delete(f"reset_token:{hashed_token}")
+    profile_cache.pop(user_data["user_id"])
     return {
         "message": "Password reset successfully",
         "user_id": user_data["user_id"],
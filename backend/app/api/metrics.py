@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from backend.app.utils.metrics import render_metrics
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    In-process metrics in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,35 +1,42 @@
 # session.py
 
 import uuid
-import json
 from datetime import datetime, timezone
+from typing import Optional, Literal
 
 from fastapi import APIRouter, HTTPException, Depends, status
-import redis
+import redis.asyncio as redis
 from backend.app.models.session_models import SessionEndRequest,SessionStartRequest,SessionReport, SessionResumeRequest, SessionResponse
 from backend.app.utils.redis_utils import get_redis_connection
-from backend.app.utils.jwt_utils import jwt_decode
-from fastapi import Request
+from backend.app.utils.auth_utils import get_current_user_id
+from backend.app.utils.session_index import session_index_key, index_session
+from backend.app.utils.focus_aggregator import focus_report
+from backend.app.utils.blink_tracker import blink_report
+from backend.app.utils.session_store import SessionStillTracked, create_session, read_sessions, complete_session
+from backend.app.utils.session_archive import (
+    ACTIVE_SESSIONS_KEY, SessionArchive, get_session_archive, mark_active, mark_completed, promote_session,
+    read_through
+)
+from backend.app.utils.gaze_store import read_gaze_series
+from backend.app.utils.session_bus import wait_for_release
+from backend.app.utils.heatmap_utils import (
+    heatmap_cache_key, gaze_histogram, heatmap_png, heatmap_grid_json, get_cached_heatmap, cache_heatmap
+)
+from backend.config import SESSION_END_WAIT
+from fastapi import Request, Query, Response
 
 router = APIRouter()
 
 @router.post("/session/start", status_code=status.HTTP_201_CREATED)
 async def start_session(
     request: SessionStartRequest,
-    response: SessionResponse,
+    user_id: str = Depends(get_current_user_id),
     redis_conn: redis.Redis = Depends(get_redis_connection)
 ):
     """
     Start a new session for a user.
     Returns HTTP 201 and session details if successful.
     """
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-
-    payload = jwt_decode(token)
-    user_id = payload.get("sub")
-
     session_id = str(uuid.uuid4())
     start_time = datetime.now(timezone.utc).isoformat()
 
@@ -40,8 +47,12 @@ async def start_session(
         "status": "active",
     }
 
-    # Store session in Redis
-    redis_conn.set(f"session:{session_id}", json.dumps(session_data))
+    # Store session in Redis and add it to the user's session index
+    pipe = redis_conn.pipeline()
+    create_session(pipe, session_id, session_data)
+    index_session(pipe, user_id, session_id, start_time)
+    mark_active(pipe, session_id, start_time, request.session_duration)
+    await pipe.execute()
 
     # Return full session info (same structure as stored)
     return {
@@ -56,37 +67,48 @@ async def start_session(
 @router.post("/session/end", status_code=status.HTTP_200_OK)
 async def end_session(
     request: SessionEndRequest,
-    redis_conn: redis.Redis = Depends(get_redis_connection)
+    redis_conn: redis.Redis = Depends(get_redis_connection),
+    archive: SessionArchive = Depends(get_session_archive)
 ):
     """
     End an existing session and return its report.
+    Ending an already completed (or archived) session returns its report again.
+    Close the tracking socket first: the session is only ended once that socket
+    has written its last buffered counters, so the report includes them.
     """
-    session_key = f"session:{request.session_id}"
-    raw_data = redis_conn.get(session_key)
+    # Marks the session completed atomically and returns it with its counters
+    end_time = datetime.now(timezone.utc).isoformat()
+    try:
+        await wait_for_release(redis_conn, request.session_id, SESSION_END_WAIT)
+        completed_now, session_data = await complete_session(redis_conn, request.session_id, end_time)
+        if session_data is None and await promote_session(redis_conn, archive, request.session_id):
+            completed_now, session_data = await complete_session(redis_conn, request.session_id, end_time)
+    except SessionStillTracked:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Session is still being tracked"
+        )
 
-    if not raw_data:
+    if session_data is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Session not found"
         )
 
-    session_data = json.loads(raw_data.decode("utf-8"))
-
-    # Example report data
+    # Counters are streamed in by the tracking socket (see FocusAggregator, BlinkTracker)
     report_data = {
         "session_id": request.session_id,
-        "focus_time": session_data.get("focus_time", 0),
-        "distraction_time": session_data.get("distraction_time", 0),
-        "activity_data": session_data.get("activity_data", {})
+        **focus_report(session_data),
+        **blink_report(session_data)
     }
 
-    # Mark session as completed
-    session_data["status"] = "completed"
-    session_data["end_time"] = datetime.now(timezone.utc).isoformat()
-    session_data["report"] = report_data
-
-    # Update session in Redis
-    redis_conn.set(session_key, json.dumps(session_data))
+    if completed_now:
+        # Queue it for archiving, and index it too if it predates the session index
+        pipe = redis_conn.pipeline(transaction=False)
+        mark_completed(pipe, request.session_id, end_time)
+        index_session(pipe, session_data["user_id"], request.session_id, session_data["start_time"], only_new=True)
+        pipe.zrem(ACTIVE_SESSIONS_KEY, request.session_id)
+        await pipe.execute()
 
     return {
         "message": "Session ended successfully",
@@ -96,26 +118,24 @@ async def end_session(
 
 @router.get("/session/{session_id}", status_code=status.HTTP_200_OK)
 async def get_session(
-    request: SessionResumeRequest,
-    redis_conn: redis.Redis = Depends(get_redis_connection)
+    session_id: str,
+    redis_conn: redis.Redis = Depends(get_redis_connection),
+    archive: SessionArchive = Depends(get_session_archive)
 ):
     """
     Retrieve a session by its ID.
     """
-    session_key = f"session:{request.session_id}"
-    raw_data = redis_conn.get(session_key)
+    session_data = await read_through(redis_conn, archive, session_id, ("start_time", "session_duration", "status"))
 
-    if not raw_data:
+    if session_data is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Session not found"
         )
 
-    session_data = json.loads(raw_data.decode("utf-8"))
-
     return {
         "message": "Session started successfully",
-        "session_id": request.session_id,
+        "session_id": session_id,
         "start_time": session_data["start_time"],
         "session_duration": session_data["session_duration"],
         "status": session_data["status"]
@@ -123,46 +143,103 @@ async def get_session(
 
 
 
-@router.get("/sessions", status_code=status.HTTP_200_OK)
-async def get_user_sessions(
-    request: Request,
-    redis_conn: redis.Redis = Depends(get_redis_connection)
+@router.get("/session/{session_id}/heatmap", status_code=status.HTTP_200_OK)
+async def get_session_heatmap(
+    session_id: str,
+    fmt: Literal["png", "grid"] = Query("png", alias="format"),
+    bins_x: int = Query(64, ge=4, le=512),
+    bins_y: int = Query(48, ge=4, le=512),
+    sigma: float = Query(2.0, ge=0, le=32),
+    user_id: str = Depends(get_current_user_id),
+    redis_conn: redis.Redis = Depends(get_redis_connection),
+    archive: SessionArchive = Depends(get_session_archive)
 ):
     """
-    Retrieve all sessions belonging to a specific user.
-    Returns sessions in the same format as /session/start.
+    Render the session's gaze points as a heatmap, either a PNG or the raw
+    normalised grid. Heatmaps of completed sessions are cached in Redis.
+    Only the session's owner can see it; anyone else gets a 404.
     """
-    token = request.cookies.get("access_token")
+    media_type = "image/png" if fmt == "png" else "application/json"
+    cache_key = heatmap_cache_key(user_id, session_id, fmt, bins_x, bins_y, sigma)
+
+    # Only completed sessions are cached, and only under their owner's id, so a hit
+    # needs no status or ownership check
+    cached = await get_cached_heatmap(redis_conn, cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type=media_type)
+
+    # Promotes an archived session, gaze series included, back into Redis
+    session_data = await read_through(redis_conn, archive, session_id, ("status",))
+    if session_data is None or session_data["user_id"] != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+
+    _, records = await read_gaze_series(redis_conn, session_id)
+    grid, points = gaze_histogram(records, bins_x, bins_y, sigma)
 
-    if not token:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    if fmt == "png":
+        payload = heatmap_png(grid)
+    else:
+        payload = heatmap_grid_json(session_id, grid, points)
 
-    payload = jwt_decode(token)
-    user_id = payload.get("sub")
+    if session_data.get("status") == "completed":
+        await cache_heatmap(redis_conn, cache_key, payload)
 
-    keys = redis_conn.keys("session:*")
-    user_sessions = []
+    return Response(content=payload, media_type=media_type)
 
 
-    for key in keys:
-        raw_data = redis_conn.get(key)
-        if raw_data:
-            session_data = json.loads(raw_data.decode("utf-8"))
-            if session_data.get("user_id") == user_id:
-                session_id = key.decode("utf-8").split("session:")[-1]
-                formatted_session = {
-                    "session_id": session_id,
-                    "user_id": session_data.get("user_id"),
-                    "start_time": session_data.get("start_time"),
-                    "session_duration": session_data.get("session_duration"),
-                    "status": session_data.get("status"),
-                }
-                user_sessions.append(formatted_session)
-    
-    user_sessions.sort(key=lambda x: datetime.fromisoformat(x["start_time"].replace("Z", "+00:00")), reverse=True)
+@router.get("/sessions", status_code=status.HTTP_200_OK)
+async def get_user_sessions(
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[float] = None,
+    user_id: str = Depends(get_current_user_id),
+    redis_conn: redis.Redis = Depends(get_redis_connection),
+    archive: SessionArchive = Depends(get_session_archive)
+):
+    """
+    Retrieve the sessions belonging to the current user, newest first.
+    Returns sessions in the same format as /session/start.
+    Pass the returned `next_before` as `before` to fetch the next page.
+    Recent sessions come from the Redis index, older ones from the archive.
+    """
+    index_key = session_index_key(user_id)
+    max_score = f"({before}" if before is not None else "+inf"
+    entries = await redis_conn.zrevrangebyscore(index_key, max_score, "-inf", start=0, num=limit, withscores=True)
+
+    session_ids = [member.decode("utf-8") for member, _ in entries]
+    sessions = await read_sessions(redis_conn, session_ids, ("start_time", "session_duration", "status"))
+
+    page = []
+    stale = []
+    for (_, score), session_id, session_data in zip(entries, session_ids, sessions):
+        if session_data is None:
+            stale.append(session_id)
+            continue
+        page.append((session_id, score, session_data))
+
+    if stale:
+        await redis_conn.zrem(index_key, *stale)
+
+    # Merge in the same page of archived sessions; both lists are newest first
+    seen = {session_id for session_id, _, _ in page}
+    page.extend(entry for entry in await archive.list_user_sessions(user_id, before, limit) if entry[0] not in seen)
+    page.sort(key=lambda entry: entry[1], reverse=True)
+    page = page[:limit]
+
+    user_sessions = [{
+        "session_id": session_id,
+        "user_id": session_data.get("user_id"),
+        "start_time": session_data.get("start_time"),
+        "session_duration": session_data.get("session_duration"),
+        "status": session_data.get("status"),
+    } for session_id, _, session_data in page]
 
+    next_before = page[-1][1] if len(page) == limit else None
 
     return {
         "message": f"Sessions for user {user_id} retrieved successfully",
-        "data": user_sessions
+        "data": user_sessions,
+        "next_before": next_before
     }
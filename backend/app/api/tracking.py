@@ -1,50 +1,327 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
 from fastapi.responses import HTMLResponse
 from PIL import Image
 import io
+import time
+import asyncio
 import base64
+import uuid
 import numpy as np
 import cv2
-from backend.app.utils.image_utils import decode_base64_image_from_json, detect_faces_and_gaze
+import redis.asyncio as redis
+from backend.app.utils.image_utils import decode_base64_image_from_json, decode_binary_frame
+from backend.app.utils.inference_engine import InferenceEngine, get_inference_engine
+from backend.app.utils.frame_buffer import LatestFrameSlot
+from backend.app.utils.focus_aggregator import FocusAggregator
+from backend.app.utils.blink_tracker import BlinkTracker
+from backend.app.utils.gaze_store import GazeSeriesBuffer, open_gaze_series
+from backend.app.utils.roi_tracker import RoiTracker
+from backend.app.utils.frame_dedup import FrameDeduplicator
+from backend.app.utils.rate_control import RateController
+from backend.app.utils.session_store import read_session, upgrade_legacy_session
+from backend.app.utils.session_bus import (
+    SessionPublisher, SessionLease, SessionLeaseLost, SessionStreamHub, get_session_hub
+)
+from backend.app.utils.redis_utils import get_redis_connection
+from backend.app.utils.auth_utils import get_current_user_id
+from backend.app.utils.tracking_metrics import (
+    StageTimer, observe_stages, frame_rate, reuse_rate, tracking_frames, tracking_frame_seconds,
+    tracking_active_sockets, tracking_inference_reused,
+)
+from backend.config import TRACKING_FLUSH_INTERVAL
 router = APIRouter()
 
+# How long a socket's last write sequence number is kept (see TrackingState.write)
+WRITE_MARKER_TTL = 24 * 60 * 60
+
+
+def write_marker_key(session_id: str, writer: str) -> str:
+    return f"session_write:{session_id}:{writer}"
+
+
+class TrackingState:
+    """
+    Per-socket state shared by the receive and inference tasks. Everything that
+    has to reach Redis is buffered here and written in one pipeline per flush;
+    live results for the session bus go out on their own, shorter interval.
+    """
+
+    def __init__(self, session_id: str, gaze_series: GazeSeriesBuffer):
+        self.session_id = session_id
+        self.slot = LatestFrameSlot()
+        self.focus = FocusAggregator(session_id)
+        self.blinks = BlinkTracker(session_id)
+        self.gaze_series = gaze_series
+        self.roi = RoiTracker()
+        self.dedup = FrameDeduplicator()
+        self.rate = RateController()
+        self.bus = SessionPublisher(session_id)
+        self._last_flush = time.monotonic()
+        self._write_key = write_marker_key(session_id, uuid.uuid4().hex)
+        self._write_seq = 0
+        self._unconfirmed = None  # (seq, buffers) of a write whose outcome is unknown
+
+    def record(self, gaze):
+        """Returns the focus state and the rolling blink rate."""
+        self.gaze_series.append(gaze)
+        focus_state = self.focus.add(gaze)
+        blink_rate = self.blinks.add(gaze)
+        self.bus.add(gaze, focus_state)
+        return focus_state, blink_rate
+
+    def flush_due(self) -> bool:
+        return self.gaze_series.full or time.monotonic() - self._last_flush >= TRACKING_FLUSH_INTERVAL
+
+    async def flush(self, redis_conn: redis.Redis):
+        self._last_flush = time.monotonic()
+        await self.write(redis_conn, (self.focus, self.blinks, self.gaze_series, self.bus))
+
+    async def publish(self, redis_conn: redis.Redis):
+        await self.write(redis_conn, (self.bus,))
+
+    async def write(self, redis_conn: redis.Redis, buffers):
+        """
+        Write the buffers' pending data in one MULTI/EXEC that also stores a sequence
+        number under this socket's marker key. When EXEC raises (connection lost,
+        task cancelled) it may or may not have been applied, so the next write
+        first reads the marker: if the earlier write went through its data is
+        dropped from the buffers, otherwise it is written again. Either way nothing
+        is lost or counted twice.
+        """
+        if self._unconfirmed is not None:
+            seq, pending = self._unconfirmed
+            if await redis_conn.get(self._write_key) == str(seq).encode():
+                for buffer in pending:
+                    buffer.flushed()
+            self._unconfirmed = None
+
+        pipe = redis_conn.pipeline()
+        for buffer in buffers:
+            buffer.flush_into(pipe)
+        if len(pipe):
+            self._write_seq += 1
+            pipe.set(self._write_key, self._write_seq, ex=WRITE_MARKER_TTL)
+            self._unconfirmed = (self._write_seq, buffers)
+            await pipe.execute()
+            self._unconfirmed = None
+        for buffer in buffers:
+            buffer.flushed()
+
+
+async def run_inference(engine: InferenceEngine, state: TrackingState, frame):
+    # A frame that barely changed since the last inference reuses its result.
+    # Otherwise landmarks run on a crop around the last face; if the face is lost
+    # there, retry the same frame at full size before reporting no face.
+    # Returns (result, reused).
+    cached, thumbnail = state.dedup.lookup(frame)
+    if cached is not None:
+        return cached, True
+
+    periodic_check = state.roi.detection_due()
+    image, offset, scale = state.roi.prepare(frame)
+    result = await engine.detect_faces_and_gaze(image, state.session_id, offset, scale, periodic_check)
+    if result["face_box"] is None and state.roi.tracking:
+        state.roi.reset()
+        image, offset, scale = state.roi.prepare(frame)
+        result = await engine.detect_faces_and_gaze(image, state.session_id, offset, scale)
+    state.roi.update(result["face_box"])
+    state.dedup.store(result, thumbnail)
+    return result, False
+
+
+async def receive_frames(websocket: WebSocket, slot: LatestFrameSlot):
+    # Never blocks on inference: a newer frame simply replaces the pending one.
+    # Frames arrive either as JSON text (data URL) or as binary FRAME_HEADER + JPEG,
+    # and are stored with their arrival time for the "slot_wait" stage metric.
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            data = message.get("bytes")
+            if data is None:
+                data = message.get("text")
+            if data is not None:
+                slot.put((data, time.perf_counter()))
+    finally:
+        slot.close()
+
+
+async def process_frames(
+    websocket: WebSocket,
+    state: TrackingState,
+    engine: InferenceEngine,
+    redis_conn: redis.Redis
+):
+    while True:
+        frame, skipped = await state.slot.take()
+        if frame is None:
+            return
+        data, received = frame
+
+        try:
+            started = time.perf_counter()
+            timer = StageTimer()
+            timer.times["slot_wait"] = started - received  # arrival until taken off the slot
+            header = None
+            if isinstance(data, bytes):
+                header, decoded = decode_binary_frame(data, timer)
+            else:
+                decoded = decode_base64_image_from_json(data, timer)
+
+            if decoded is not None:
+
+                result, reused = await run_inference(engine, state, decoded)
+                if reused:
+                    timer.mark("dedup")
+                    tracking_inference_reused.inc()
+                    reuse_rate.mark()
+                else:
+                    timer.restart()  # worker stages are recorded by the inference engine
+                gaze = result["gaze"]
+                face_box = result["face_box"]
+                focus_state, blink_rate = state.record(gaze)
+
+                response = {
+                    "gaze": gaze,
+                    "face": face_box,
+                    "state": focus_state,
+                    "blink_rate": blink_rate,
+                    "skipped": skipped,
+                    "reused": reused
+                }
+                if header is not None:
+                    # Echo the frame identity so binary clients can match results and measure RTT
+                    response["seq"] = header["seq"]
+                    response["timestamp"] = header["timestamp"]
+
+                await websocket.send_json(response)
+                timer.mark("send")
+                observe_stages(timer.times)
+                tracking_frame_seconds.observe(time.perf_counter() - started)
+                tracking_frames.inc()
+                frame_rate.mark()
+
+                # Ask the client to slow down / shrink frames when we're loaded or the gaze is idle
+                control = state.rate.update(
+                    time.perf_counter() - started, gaze, engine.pending / engine.queue_size
+                )
+                if control is not None:
+                    await websocket.send_json({"control": control})
+
+                if state.flush_due():
+                    await state.flush(redis_conn)
+                elif state.bus.publish_due():
+                    await state.publish(redis_conn)
+
+            else:
+                print("❌ Could not decode image")
+
+        except Exception as e:
+            print(f"❌ Error processing frame: {e}")
+            await websocket.send_json({"error": str(e), "skipped": skipped})
+
+
 @router.websocket("/ws/session/{session_id}/track")
-async def track_session(session_id: str, websocket: WebSocket):
+async def track_session(
+    session_id: str,
+    websocket: WebSocket,
+    engine: InferenceEngine = Depends(get_inference_engine),
+    redis_conn: redis.Redis = Depends(get_redis_connection)
+):
     print("WebSocket handler called for session", session_id)
     try:
         await websocket.accept()
         print(f"📡 WebSocket connected for session {session_id}")
 
+        # Only one socket, on any worker, may track a session at a time
+        lease = SessionLease(redis_conn, session_id)
+        if not await lease.acquire():
+            print(f"❌ Session {session_id} is already being tracked elsewhere")
+            await websocket.close(code=4409, reason="Session is already being tracked")
+            return
+
         try:
-            while True:
-                try:
-                    data = await websocket.receive_text()
-                    
+            # Checked while holding the lease: complete_session refuses while it is held
+            session_data = await read_session(redis_conn, session_id, ("status",))
+            if session_data is None:
+                print(f"❌ Session {session_id} not found")
+                await websocket.close(code=4404, reason="Session not found")
+                return
+            if session_data["status"] != "active":
+                print(f"❌ Session {session_id} has already ended")
+                await websocket.close(code=4410, reason="Session has already ended")
+                return
 
-                    decoded = decode_base64_image_from_json(data)
-                    if decoded is not None:
+            # Counters are HINCRBY'd into the session hash, so convert a legacy JSON session first
+            await upgrade_legacy_session(redis_conn, session_id)
+            state = TrackingState(session_id, await open_gaze_series(redis_conn, session_id))
+            await websocket.send_json({"control": state.rate.initial()})
+            receiver = asyncio.create_task(receive_frames(websocket, state.slot))
+            processor = asyncio.create_task(process_frames(websocket, state, engine, redis_conn))
+            keeper = asyncio.create_task(lease.keep_alive())
 
-                        result= detect_faces_and_gaze(decoded)
-                        gaze = result["gaze"]
-                        face_box = result["face_box"]   
+            tracking_active_sockets.inc()
+            try:
+                done, pending = await asyncio.wait({receiver, processor, keeper}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                tracking_active_sockets.dec()
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
-                        await websocket.send_json({
-                            "gaze": gaze,
-                            "face": face_box 
-                        })
+            try:
+                for task in done:
+                    task.result()
+            except WebSocketDisconnect:
+                print(
+                    f"❌ WebSocket disconnected for session {session_id} ({state.slot.total_skipped} frames skipped, "
+                    f"{state.dedup.skip_ratio:.0%} of results reused)"
+                )
+            except SessionLeaseLost:
+                print(f"❌ Lost ownership of session {session_id}")
+                await websocket.close(code=4409, reason="Session is being tracked elsewhere")
+            finally:
+                state.bus.end()
+                await state.flush(redis_conn)
+        finally:
+            await lease.release()
 
-                    else:
-                        print("❌ Could not decode image")
+    except Exception as e:
+        print(f"❌ Error in WebSocket handler for session {session_id}: {e}")
+        await websocket.close(code=1011, reason="Internal server error")
 
-                except Exception as e:
-                    print(f"❌ Error processing frame: {e}")
-                    await websocket.send_json({"error": str(e)})
-                    continue
 
-        except WebSocketDisconnect:
-            print(f"❌ WebSocket disconnected for session {session_id}")
+@router.websocket("/ws/session/{session_id}/live")
+async def watch_session(
+    session_id: str,
+    websocket: WebSocket,
+    redis_conn: redis.Redis = Depends(get_redis_connection),
+    hub: SessionStreamHub = Depends(get_session_hub)
+):
+    """
+    Live feed of a session's results from the session bus, whichever worker owns
+    its tracking socket. Sends {"t", "state", "gaze"} per frame and {"t", "event": "end"}
+    when tracking stops. Only the session's owner may watch it.
+    """
+    await websocket.accept()
+    try:
+        try:
+            user_id = await get_current_user_id(websocket)
+        except HTTPException:
+            await websocket.close(code=4401, reason="Unauthorized")
+            return
+        session_data = await read_session(redis_conn, session_id, ("user_id",))
+        if session_data is None or session_data["user_id"] != user_id:
+            await websocket.close(code=4403, reason="Forbidden")
+            return
 
+        async for entry in hub.watch(session_id):
+            await websocket.send_json(entry)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
-        print(f"❌ Error in WebSocket handler for session {session_id}: {e}")
+        print(f"❌ Error in live feed for session {session_id}: {e}")
         await websocket.close(code=1011, reason="Internal server error")
-
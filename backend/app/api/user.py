@@ -3,37 +3,30 @@
 import uuid
 import json
 import bcrypt
-import redis
+import redis.asyncio as redis
 
 from fastapi import APIRouter, HTTPException, Depends, status
 from backend.app.models.user_models import UserRegister, UserLogin, UserInfoRequest
 from backend.app.utils.redis_utils import get_redis_connection
-from backend.app.utils.jwt_utils import jwt_decode
+from backend.app.utils.auth_utils import get_current_user_id
+from backend.app.utils.user_index import user_id_key, profile_cache, public_profile
 from fastapi import Request
 
 router = APIRouter()
 
 @router.get("/me")
-def get_me(
-    request: Request,
+async def get_me(
+    user_id: str = Depends(get_current_user_id),
     redis_conn: redis.Redis = Depends(get_redis_connection)
 ):
-    
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    profile = profile_cache.get(user_id)
+    if profile is None:
+        username = await redis_conn.get(user_id_key(user_id))
+        user_data_raw = await redis_conn.get(f"user:{username.decode('utf-8')}") if username else None
+        if not user_data_raw:
+            raise HTTPException(status_code=404, detail="User not found")
 
-    try:
-        payload = jwt_decode(token)
-    except Exception as e:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user_id = payload.get("sub")
+        profile = public_profile(json.loads(user_data_raw))
+        profile_cache.set(user_id, profile)
 
-    # Lookup user data (assuming you store by username)
-    for key in redis_conn.scan_iter("user:*"):
-        user_data = json.loads(redis_conn.get(key))
-        if user_data["user_id"] == user_id:
-            return {"username": user_data["username"], "user_id": user_id}
-
-    raise HTTPException(status_code=404, detail="User not found")
+    return {"username": profile["username"], "user_id": user_id}
@@ -0,0 +1,45 @@
+import time
+
+from fastapi import HTTPException, status
+from jose import JWTError
+from starlette.requests import HTTPConnection
+
+from backend.app.utils.jwt_utils import jwt_decode, ACCESS_TOKEN_EXPIRE_MINUTES
+from backend.app.utils.token_utils import hash_token
+from backend.app.utils.ttl_cache import TTLCache
+from backend.config import AUTH_CACHE_SIZE
+
+# Verified claims keyed by the SHA-256 of the token, so a polling dashboard pays for
+# signature verification once per token instead of once per request. Entries
+# expire together with the token.
+claims_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+def verify_token(token: str) -> dict:
+    key = hash_token(token)
+    claims = claims_cache.get(key)
+    if claims is not None:
+        return claims
+
+    try:
+        claims = jwt_decode(token)
+    except JWTError:
+        raise _unauthorized("Invalid token")
+    if not claims.get("sub"):
+        raise _unauthorized("Invalid token")
+
+    ttl = claims["exp"] - time.time() if "exp" in claims else None
+    if ttl is None or ttl > 0:
+        claims_cache.set(key, claims, ttl)
+    return claims
+
+async def get_current_user_id(connection: HTTPConnection) -> str:
+    """Dependency: the user_id (JWT subject) from the access_token cookie, or a 401."""
+    # HTTPConnection so WebSocket handlers can call it too
+    token = connection.cookies.get("access_token")
+    if not token:
+        raise _unauthorized("Unauthorized")
+    return verify_token(token)["sub"]
@@ -0,0 +1,147 @@
+import time
+
+import numpy as np
+
+from backend.app.utils.session_store import session_key
+from backend.config import (
+    BLINK_CLOSE_RATIO, BLINK_OPEN_RATIO, BLINK_BASELINE_FRAMES, BLINK_MAX_DURATION, BLINK_WINDOW,
+    BLINK_MAX_FRAME_GAP,
+)
+
+BLINK_FIELDS = ("blinks", "blink_tracked_ms")
+
+# Rates over less than this many sampled seconds are too noisy to report
+MIN_RATE_SPAN = 10.0
+
+
+class BlinkTracker:
+    """
+    Blink detection and a rolling blinks-per-minute value for one tracking session,
+    in constant time and memory per frame however long the session runs.
+
+    Each result's eye openness is compared with a baseline: the mean of the last
+    BLINK_BASELINE_FRAMES open-eye values, kept in a ring buffer with a running sum.
+    The eyes count as closed below BLINK_CLOSE_RATIO of the baseline and open again
+    above BLINK_OPEN_RATIO, so noise around a single threshold can't count twice; a
+    closure of at most BLINK_MAX_DURATION is a blink. Blink times go into a second
+    ring buffer that the rolling rate expires from.
+
+    Blinks only show up when frames are close together, so time is measured on a
+    clock that only advances across gaps of at most BLINK_MAX_FRAME_GAP. While the
+    client sends slower than that (the rate controller's idle rate) no time is
+    counted, the rate is reported as None and the window keeps its earlier samples,
+    so sparse sampling never reads as a low blink rate.
+
+    Like FocusAggregator, the owner periodically calls flush_into() to add the blink
+    count and the time the eyes were tracked to the session:{session_id} hash, and
+    flushed() once that write succeeded.
+    """
+
+    def __init__(self, session_id: str, window: float = BLINK_WINDOW, baseline_frames: int = BLINK_BASELINE_FRAMES):
+        self.session_id = session_id
+        self.window = window
+        self._baseline = np.zeros(max(1, baseline_frames))
+        self._baseline_next = 0
+        self._baseline_count = 0
+        self._baseline_sum = 0.0
+        # More than two blinks a second is noise, so this many slots cover a full window
+        self._blinks = np.zeros(max(1, int(window * 2)))
+        self._blinks_head = 0
+        self._blinks_count = 0
+        self._closed_at = None
+        self._sampled = 0.0
+        self._last_time = None
+        self._sparse = True
+        self._pending = dict.fromkeys(BLINK_FIELDS, 0)
+        self._flushing = dict.fromkeys(BLINK_FIELDS, 0)
+
+    def add(self, gaze, now: float = None):
+        """Feed one gaze result. Returns the rolling blinks per minute (None while warming up or sampling sparsely)."""
+        now = time.monotonic() if now is None else now
+        openness = gaze.get("openness") if gaze is not None else None
+        if openness is None:
+            # No landmarks: a closure can't span the gap, and the time isn't tracked
+            self._closed_at = None
+            self._last_time = None
+            self._sparse = True
+            return None
+
+        gap = None if self._last_time is None else now - self._last_time
+        self._last_time = now
+        self._sparse = gap is None or gap > BLINK_MAX_FRAME_GAP
+        if self._sparse:
+            # A blink could have come and gone unseen; don't carry a closure across
+            self._closed_at = None
+        else:
+            self._sampled += gap
+            self._pending["blink_tracked_ms"] += gap * 1000  # fractional ms, see flush_into
+
+        baseline = self._baseline_sum / self._baseline_count if self._baseline_count else None
+        if self._closed_at is None:
+            if baseline is not None and not self._sparse and openness < baseline * BLINK_CLOSE_RATIO:
+                self._closed_at = now
+            else:
+                self._add_baseline(openness)
+        elif openness > baseline * BLINK_OPEN_RATIO:
+            if now - self._closed_at <= BLINK_MAX_DURATION:
+                self._add_blink()
+            self._closed_at = None
+            self._add_baseline(openness)
+        elif now - self._closed_at > BLINK_MAX_DURATION:
+            # Too long for a blink (squinting, looking down): let the baseline follow
+            self._add_baseline(openness)
+
+        return self.rate()
+
+    def rate(self):
+        """Blinks per minute over the last `window` sampled seconds, or None."""
+        cutoff = self._sampled - self.window
+        while self._blinks_count and self._blinks[self._blinks_head] < cutoff:
+            self._blinks_head = (self._blinks_head + 1) % len(self._blinks)
+            self._blinks_count -= 1
+
+        span = min(self.window, self._sampled)
+        if self._sparse or span < MIN_RATE_SPAN:
+            return None
+        return round(self._blinks_count * 60 / span, 1)
+
+    def _add_baseline(self, openness: float):
+        if self._baseline_count == len(self._baseline):
+            self._baseline_sum -= self._baseline[self._baseline_next]
+        else:
+            self._baseline_count += 1
+        self._baseline[self._baseline_next] = openness
+        self._baseline_sum += openness
+        self._baseline_next = (self._baseline_next + 1) % len(self._baseline)
+
+    def _add_blink(self):
+        capacity = len(self._blinks)
+        if self._blinks_count == capacity:
+            self._blinks_head = (self._blinks_head + 1) % capacity
+            self._blinks_count -= 1
+        self._blinks[(self._blinks_head + self._blinks_count) % capacity] = self._sampled
+        self._blinks_count += 1
+        self._pending["blinks"] += 1
+
+    def flush_into(self, pipe):
+        key = session_key(self.session_id)
+        # Only whole ms are sent; the fraction stays pending for the next flush
+        self._flushing = {field: int(amount) for field, amount in self._pending.items()}
+        for field, amount in self._flushing.items():
+            if amount:
+                pipe.hincrby(key, field, amount)
+
+    def flushed(self):
+        for field, amount in self._flushing.items():
+            self._pending[field] -= amount
+        self._flushing = dict.fromkeys(BLINK_FIELDS, 0)
+
+
+def blink_report(stats: dict) -> dict:
+    """Blink count and blinks per minute of densely sampled time from a session hash's counters."""
+    counts = {field: int(stats.get(field.encode(), stats.get(field, 0))) for field in BLINK_FIELDS}
+    tracked_ms = counts["blink_tracked_ms"]
+    return {
+        "blinks": counts["blinks"],
+        "blink_rate": round(counts["blinks"] * 60000 / tracked_ms, 1) if tracked_ms else 0.0,
+    }
@@ -0,0 +1,251 @@
+import asyncio
+import json
+import time
+import uuid
+
+import redis.asyncio as redis
+
+from backend.app.utils.mailer import build_password_reset_email
+from backend.app.utils.metrics import Counter, Gauge
+from backend.config import (
+    EMAIL_BATCH_SIZE, EMAIL_MAX_ATTEMPTS, EMAIL_RETRY_BASE, EMAIL_IDLE_TIMEOUT, EMAIL_WORKER_TIMEOUT,
+    EMAIL_DEAD_MAX, RESET_TOKEN_TTL,
+)
+
+# Jobs wait in a Redis list (LPUSH / BLMOVE), failed ones in a sorted set scored by
+# when they are due again, and ones that ran out of attempts in a capped dead-letter
+# list. A worker moves the jobs it is sending into its own processing list, so jobs
+# held by a worker that died are put back on the queue (see EmailWorker).
+EMAIL_QUEUE_KEY = "email_queue"
+EMAIL_RETRY_KEY = "email_queue:retry"
+EMAIL_DEAD_KEY = "email_queue:dead"
+EMAIL_WORKERS_KEY = "email_workers"
+
+# Secrets (reset tokens) never go into job JSON: they live in their own key, which
+# expires with the token and is deleted once the job is sent or given up on
+def email_secret_key(job_id: str) -> str:
+    return f"email_secret:{job_id}"
+
+def processing_key(worker_id: str) -> str:
+    return f"email_queue:processing:{worker_id}"
+
+# Every job kind maps to the function that renders its message from the job and its secret
+BUILDERS = {
+    "password_reset": lambda job, secret: build_password_reset_email(job["to"], secret),
+}
+
+emails_sent = Counter("emails_sent_total", "Emails handed to the transport")
+emails_retried = Counter("emails_retried_total", "Email sends that failed and were scheduled for retry")
+emails_dead = Counter("emails_dead_total", "Emails given up on after EMAIL_MAX_ATTEMPTS")
+email_batch_size = Gauge("email_last_batch_size", "Jobs in the most recent email batch")
+
+
+def password_reset_job(email: str) -> dict:
+    return {"id": str(uuid.uuid4()), "kind": "password_reset", "to": email, "attempts": 0}
+
+def enqueue_email(redis_conn, job: dict, secret: str = None, secret_ttl: int = RESET_TOKEN_TTL):
+    """
+    Queue a job, storing `secret` next to it for `secret_ttl` seconds. Works on a
+    client or a pipeline (await the result on a client); use a pipeline when
+    there is a secret so both writes go out together.
+    """
+    if secret is not None:
+        job = {**job, "secret": True}
+        redis_conn.set(email_secret_key(job["id"]), secret, ex=secret_ttl)
+    return redis_conn.lpush(EMAIL_QUEUE_KEY, json.dumps(job))
+
+
+# Moves up to ARGV[2] retries due by ARGV[1] back to the consumer end of the queue,
+# so concurrent workers can't both promote (and send) the same job
+_PROMOTE_DUE_RETRIES = """
+local due = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+if #due > 0 then
+    redis.call("ZREM", KEYS[1], unpack(due))
+    redis.call("RPUSH", KEYS[2], unpack(due))
+end
+return #due
+"""
+
+# Puts a dead worker's processing list back on the queue, if its heartbeat
+# (score in KEYS[1]) is still older than ARGV[2]
+_RECOVER_WORKER = """
+local heartbeat = redis.call("ZSCORE", KEYS[1], ARGV[1])
+if not heartbeat or tonumber(heartbeat) >= tonumber(ARGV[2]) then
+    return 0
+end
+local jobs = redis.call("LRANGE", KEYS[2], 0, -1)
+if #jobs > 0 then
+    redis.call("RPUSH", KEYS[3], unpack(jobs))
+end
+redis.call("DEL", KEYS[2])
+redis.call("ZREM", KEYS[1], ARGV[1])
+return #jobs
+"""
+
+
+class EmailWorker:
+    """
+    Background task that drains the email queue. Jobs are moved in batches of up
+    to `batch_size` into this worker's processing list and sent over one transport
+    connection, in a thread so SMTP never blocks the event loop. The connection
+    stays open between batches and is closed after EMAIL_IDLE_TIMEOUT seconds
+    without work.
+
+    Delivery is at-least-once: a job leaves the processing list only once it was
+    sent, rescheduled or given up on. Workers heartbeat in the email_workers sorted
+    set; one that hasn't for `worker_timeout` seconds is presumed dead and the jobs
+    in its processing list are queued again by whichever worker notices.
+    """
+
+    def __init__(
+        self,
+        redis_conn: redis.Redis,
+        transport,
+        batch_size: int = EMAIL_BATCH_SIZE,
+        max_attempts: int = EMAIL_MAX_ATTEMPTS,
+        retry_base: float = EMAIL_RETRY_BASE,
+        idle_timeout: float = EMAIL_IDLE_TIMEOUT,
+        worker_timeout: float = EMAIL_WORKER_TIMEOUT,
+        poll_interval: float = 1.0
+    ):
+        self.redis = redis_conn
+        self.transport = transport
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.idle_timeout = idle_timeout
+        self.worker_timeout = worker_timeout
+        self.poll_interval = poll_interval
+        self.worker_id = str(uuid.uuid4())
+        self._task = None
+        self._stopping = False
+        self._last_recovery = 0.0
+
+    def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        # Let the current BLMOVE / batch finish rather than cancelling it
+        if self._task is not None:
+            self._stopping = True
+            try:
+                await asyncio.wait_for(self._task, timeout + self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._task = None
+            try:
+                await self._release()
+            except Exception as e:
+                print(f"❌ Email worker could not requeue its jobs: {e}")
+        await asyncio.to_thread(self.transport.close)
+
+    async def _run(self):
+        last_sent = time.monotonic()
+        while not self._stopping:
+            try:
+                await self._heartbeat()
+                await self._promote_due_retries()
+                batch = await self._take_batch()
+                if batch:
+                    await self._send_batch(batch)
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= self.idle_timeout:
+                    await asyncio.to_thread(self.transport.close)
+                    last_sent = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Email worker error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _heartbeat(self):
+        now = time.time()
+        await self.redis.zadd(EMAIL_WORKERS_KEY, {self.worker_id: now})
+        if now - self._last_recovery >= self.worker_timeout / 2:
+            self._last_recovery = now
+            await self._recover_dead_workers(now - self.worker_timeout)
+
+    async def _recover_dead_workers(self, cutoff: float):
+        for worker_id in await self.redis.zrangebyscore(EMAIL_WORKERS_KEY, "-inf", cutoff):
+            worker_id = worker_id.decode("utf-8")
+            requeued = await self.redis.eval(
+                _RECOVER_WORKER, 3, EMAIL_WORKERS_KEY, processing_key(worker_id), EMAIL_QUEUE_KEY, worker_id, cutoff
+            )
+            if requeued:
+                print(f"❌ Email worker {worker_id} stopped responding; requeued {requeued} jobs")
+
+    async def _release(self):
+        # Anything still held (e.g. the batch was cut short) goes back to the queue now
+        await self.redis.eval(
+            _RECOVER_WORKER, 3, EMAIL_WORKERS_KEY, processing_key(self.worker_id), EMAIL_QUEUE_KEY,
+            self.worker_id, time.time() + 1
+        )
+
+    async def _promote_due_retries(self):
+        await self.redis.eval(_PROMOTE_DUE_RETRIES, 2, EMAIL_RETRY_KEY, EMAIL_QUEUE_KEY, time.time(), self.batch_size)
+
+    async def _take_batch(self):
+        # Retries are RPUSHed to the consumer end, so they go out first
+        processing = processing_key(self.worker_id)
+        first = await self.redis.blmove(EMAIL_QUEUE_KEY, processing, self.poll_interval, "RIGHT", "LEFT")
+        if first is None:
+            return []
+        raw_jobs = [first]
+        if self.batch_size > 1:
+            pipe = self.redis.pipeline(transaction=False)
+            for _ in range(self.batch_size - 1):
+                pipe.lmove(EMAIL_QUEUE_KEY, processing, "RIGHT", "LEFT")
+            raw_jobs.extend(raw for raw in await pipe.execute() if raw is not None)
+        return raw_jobs
+
+    def _deliver(self, batch):
+        # Runs in a worker thread; returns one exception (or None) per job
+        errors = []
+        for job, secret in batch:
+            try:
+                self.transport.send(BUILDERS[job["kind"]](job, secret))
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    async def _send_batch(self, raw_jobs):
+        email_batch_size.set(len(raw_jobs))
+        jobs = [json.loads(raw) for raw in raw_jobs]
+        secrets = await self.redis.mget([email_secret_key(job["id"]) for job in jobs])
+
+        batch, errors = [], []
+        for job, secret in zip(jobs, secrets):
+            if job.get("secret") and secret is None:
+                errors.append(LookupError("secret expired before the email could be sent"))
+            else:
+                batch.append((job, secret.decode("utf-8") if secret is not None else None))
+                errors.append(None)
+        sent = iter(await asyncio.to_thread(self._deliver, batch))
+        errors = [error if error is not None else next(sent) for error in errors]
+
+        # Each job leaves the processing list in the same transaction that settles it
+        processing = processing_key(self.worker_id)
+        pipe = self.redis.pipeline()
+        for raw, job, error in zip(raw_jobs, jobs, errors):
+            pipe.lrem(processing, 1, raw)
+            if error is None:
+                emails_sent.inc()
+                pipe.delete(email_secret_key(job["id"]))
+                continue
+
+            job["attempts"] += 1
+            job["error"] = str(error)
+            if job["attempts"] >= self.max_attempts or isinstance(error, (KeyError, ValueError, LookupError)):
+                # Unknown job kinds, refused recipients and expired tokens won't succeed on retry
+                print(f"❌ Giving up on email {job['id']} after {job['attempts']} attempts: {error}")
+                emails_dead.inc()
+                pipe.delete(email_secret_key(job["id"]))
+                pipe.lpush(EMAIL_DEAD_KEY, json.dumps(job))
+                pipe.ltrim(EMAIL_DEAD_KEY, 0, EMAIL_DEAD_MAX - 1)
+            else:
+                emails_retried.inc()
+                due = time.time() + self.retry_base * 2 ** (job["attempts"] - 1)
+                pipe.zadd(EMAIL_RETRY_KEY, {json.dumps(job): due})
+        await pipe.execute()
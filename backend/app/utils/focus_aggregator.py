@@ -0,0 +1,89 @@
+import time
+
+from backend.app.utils.session_store import session_key
+from backend.config import (
+    FOCUS_MAX_HORIZONTAL, FOCUS_MIN_VERTICAL, FOCUS_MAX_VERTICAL, FOCUS_MAX_FRAME_GAP,
+)
+
+FOCUSED = "focused"
+DISTRACTED = "distracted"
+
+STAT_FIELDS = ("focused_ms", "distracted_ms", "frames", "focused_frames", "distracted_frames", "no_face_frames")
+
+def classify_gaze(gaze) -> str:
+    # No face, or eyes pointing outside the screen band, counts as distracted
+    if gaze is None:
+        return DISTRACTED
+    if abs(gaze["horizontal"]) > FOCUS_MAX_HORIZONTAL:
+        return DISTRACTED
+    if not FOCUS_MIN_VERTICAL <= gaze["vertical"] <= FOCUS_MAX_VERTICAL:
+        return DISTRACTED
+    return FOCUSED
+
+
+class FocusAggregator:
+    """
+    Accumulates focused/distracted time for one tracking session in O(1) memory.
+    The time between two results is credited to the earlier result's state
+    (capped at FOCUS_MAX_FRAME_GAP so stalls don't count). The owner periodically
+    calls flush_into() to add the counters to the session:{session_id} hash, then
+    flushed() once the pipeline has run; if it fails, the counts are sent next time.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self._pending = dict.fromkeys(STAT_FIELDS, 0)
+        self._flushing = dict.fromkeys(STAT_FIELDS, 0)
+        self._last_state = None
+        self._last_time = None
+
+    def add(self, gaze, now: float = None) -> str:
+        now = time.monotonic() if now is None else now
+        state = classify_gaze(gaze)
+
+        if self._last_state is not None:
+            elapsed = min(now - self._last_time, FOCUS_MAX_FRAME_GAP)
+            # Kept in fractional ms; truncating every frame would lose up to 1 ms each
+            self._pending[f"{self._last_state}_ms"] += elapsed * 1000
+
+        self._pending["frames"] += 1
+        self._pending[f"{state}_frames"] += 1
+        if gaze is None:
+            self._pending["no_face_frames"] += 1
+
+        self._last_state = state
+        self._last_time = now
+        return state
+
+    def flush_into(self, pipe):
+        # Queue HINCRBYs for everything counted since the last successful flush.
+        # Only whole ms are sent; the fraction stays pending for the next flush
+        key = session_key(self.session_id)
+        self._flushing = {field: int(amount) for field, amount in self._pending.items()}
+        for field, amount in self._flushing.items():
+            if amount:
+                pipe.hincrby(key, field, amount)
+
+    def flushed(self):
+        # Only what was queued is taken off; counts added meanwhile stay pending
+        for field, amount in self._flushing.items():
+            self._pending[field] -= amount
+        self._flushing = dict.fromkeys(STAT_FIELDS, 0)
+
+
+def focus_report(stats: dict) -> dict:
+    """
+    Turn the counters of a session hash (as returned by HGETALL) into report numbers.
+    Times are in whole seconds, like SessionReport.
+    """
+    counts = {field: int(stats.get(field.encode(), stats.get(field, 0))) for field in STAT_FIELDS}
+    return {
+        "focus_time": counts["focused_ms"] // 1000,
+        "distraction_time": counts["distracted_ms"] // 1000,
+        "activity_data": {
+            "frames": counts["frames"],
+            "focused_frames": counts["focused_frames"],
+            "distracted_frames": counts["distracted_frames"],
+            "no_face_frames": counts["no_face_frames"],
+        }
+    }
@@ -0,0 +1,44 @@
+import asyncio
+
+
+class LatestFrameSlot:
+    """
+    Single-slot mailbox between a WebSocket receive loop and its inference loop.
+    Only the newest pending frame is kept; frames that get overwritten before
+    inference picks them up are counted as skipped.
+    """
+
+    def __init__(self):
+        self._frame = None
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.skipped = 0
+        self.total_skipped = 0
+
+    def put(self, frame):
+        if self._frame is not None:
+            self.skipped += 1
+            self.total_skipped += 1
+        self._frame = frame
+        self._ready.set()
+
+    def close(self):
+        self._closed = True
+        self._ready.set()
+
+    async def take(self):
+        """
+        Wait for the next frame. Returns (frame, skipped) where skipped is the
+        number of frames dropped since the previous take, or (None, 0) once
+        the slot is closed and drained.
+        """
+        while self._frame is None:
+            if self._closed:
+                return None, 0
+            self._ready.clear()
+            await self._ready.wait()
+
+        frame, skipped = self._frame, self.skipped
+        self._frame = None
+        self.skipped = 0
+        return frame, skipped
@@ -0,0 +1,81 @@
+import time
+
+import cv2
+import numpy as np
+
+from backend.config import DEDUP_THRESHOLD, DEDUP_MAX_AGE, DEDUP_THUMBNAIL_WIDTH
+
+
+class FrameDeduplicator:
+    """
+    Per-session check for frames that barely differ from the last one inference ran
+    on. Each decoded frame is shrunk to a tiny grayscale thumbnail (a fraction of a
+    millisecond) and compared cell by cell with the thumbnail of that frame.
+
+    The largest cell difference is used rather than the mean: gaze shifts and blinks
+    only change the few cells around the eyes, which a mean over the whole frame
+    would wash out, while camera noise averages away inside every cell.
+
+    The whole frame is compared, not the ROI crop, because the crop follows the
+    face box and moves a little on every inference even when the scene doesn't.
+    A result older than `max_age` is never reused, so the gaze is refreshed
+    periodically even on a completely static scene.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        max_age: float = DEDUP_MAX_AGE,
+        width: int = DEDUP_THUMBNAIL_WIDTH
+    ):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.width = width
+        self.reused = 0
+        self.inferred = 0
+        self._reference = None
+        self._result = None
+        self._result_time = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    @property
+    def skip_ratio(self) -> float:
+        total = self.reused + self.inferred
+        return self.reused / total if total else 0.0
+
+    def thumbnail(self, frame):
+        ih, iw = frame.shape[:2]
+        size = (self.width, max(1, round(self.width * ih / iw)))
+        # Shrink before converting so the color conversion only touches the thumbnail
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def lookup(self, frame, now: float = None):
+        """
+        Return (cached result or None, thumbnail). Pass the thumbnail to store()
+        along with the fresh result when there is no cached one.
+        """
+        if not self.enabled:
+            return None, None
+        now = time.monotonic() if now is None else now
+        thumbnail = self.thumbnail(frame)
+        if (
+            self._result is not None
+            and now - self._result_time <= self.max_age
+            and thumbnail.shape == self._reference.shape
+            and np.abs(thumbnail - self._reference).max() <= self.threshold
+        ):
+            self.reused += 1
+            return self._result, thumbnail
+        return None, thumbnail
+
+    def store(self, result, thumbnail, now: float = None):
+        self.inferred += 1
+        if thumbnail is None:
+            return
+        self._reference = thumbnail
+        self._result = result
+        self._result_time = time.monotonic() if now is None else now
@@ -0,0 +1,86 @@
+import time
+
+import numpy as np
+
+from backend.config import GAZE_BUFFER_RECORDS
+
+# One fixed-width record per gaze result, packed little-endian (9 bytes):
+#   t     ms since the session's gaze origin
+#   x, y  horizontal / vertical gaze ratio (NaN when no face was found)
+#   face  1 if a face was found
+# An hour at 10 fps is 36,000 records, about 324 KB, versus several MB as JSON GazePoints.
+GAZE_RECORD = np.dtype([("t", "<u4"), ("x", "<f2"), ("y", "<f2"), ("face", "u1")])
+
+
+def gaze_series_key(session_id: str) -> str:
+    return f"gaze:{session_id}"
+
+def gaze_origin_key(session_id: str) -> str:
+    return f"gaze_origin:{session_id}"
+
+
+class GazeSeriesBuffer:
+    """
+    Array-backed buffer of GAZE_RECORDs for one tracking socket. flush_into()
+    APPENDs the buffered records to the session's bytes key as one packed chunk;
+    they are only dropped from the buffer by flushed(), once that write succeeded.
+    """
+
+    def __init__(self, session_id: str, origin_ms: int, capacity: int = GAZE_BUFFER_RECORDS):
+        self.session_id = session_id
+        self.origin_ms = origin_ms
+        self._records = np.zeros(capacity, dtype=GAZE_RECORD)
+        self._count = 0
+        self._flushing = 0
+
+    @property
+    def full(self) -> bool:
+        return self._count == len(self._records)
+
+    def append(self, gaze, now_ms: int = None):
+        if self.full:
+            return  # a flush is overdue; drop rather than grow
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        t = max(now_ms - self.origin_ms, 0)
+        if gaze is None:
+            self._records[self._count] = (t, np.nan, np.nan, 0)
+        else:
+            self._records[self._count] = (t, gaze["horizontal"], gaze["vertical"], 1)
+        self._count += 1
+
+    def flush_into(self, pipe):
+        self._flushing = self._count
+        if self._count:
+            pipe.append(gaze_series_key(self.session_id), self._records[:self._count].tobytes())
+
+    def flushed(self):
+        # Keep any records appended while the write was in flight
+        remaining = self._count - self._flushing
+        self._records[:remaining] = self._records[self._flushing:self._count]
+        self._count = remaining
+        self._flushing = 0
+
+
+async def open_gaze_series(redis_conn, session_id: str) -> GazeSeriesBuffer:
+    # The first socket for a session fixes the origin; reconnects keep appending against it
+    now_ms = int(time.time() * 1000)
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.set(gaze_origin_key(session_id), now_ms, nx=True)
+    pipe.get(gaze_origin_key(session_id))
+    _, origin = await pipe.execute()
+    return GazeSeriesBuffer(session_id, int(origin))
+
+async def read_gaze_series(redis_conn, session_id: str):
+    """
+    Returns (origin_ms, records) where records is a read-only GAZE_RECORD array
+    viewing the bytes fetched from Redis; no per-point objects are created.
+    """
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.get(gaze_origin_key(session_id))
+    pipe.get(gaze_series_key(session_id))
+    origin, raw = await pipe.execute()
+
+    if not raw:
+        return int(origin or 0), np.empty(0, dtype=GAZE_RECORD)
+    count = len(raw) // GAZE_RECORD.itemsize
+    return int(origin or 0), np.frombuffer(raw, dtype=GAZE_RECORD, count=count)
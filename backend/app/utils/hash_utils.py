@@ -1,9 +1,64 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
+from fastapi import HTTPException, status
+from backend.app.utils.metrics import Counter, Gauge, Histogram
+from backend.config import BCRYPT_ROUNDS, HASH_WORKERS, HASH_QUEUE_SIZE
+
 def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode("utf-8"), salt)
     return hashed.decode("utf-8")
 
 # Utility function to check hashed password
 def check_password(hashed_password: str, candidate_password: str) -> bool:
     return bcrypt.checkpw(candidate_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+# bcrypt is deliberately slow, so it runs on a small dedicated pool instead of the
+# event loop. Once HASH_WORKERS jobs are running and HASH_QUEUE_SIZE are waiting,
+# new requests are rejected with a 429 rather than piling up behind a login storm.
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_in_flight = 0
+
+hash_queue_depth = Gauge("password_hash_queue_depth", "bcrypt jobs queued or running")
+hash_queue_depth.set_function(lambda: _in_flight)
+hash_rejected = Counter("password_hash_rejected_total", "bcrypt jobs rejected because the queue was full")
+hash_wait = Histogram("password_hash_wait_seconds", "Time bcrypt jobs spent waiting for a worker")
+hash_duration = Histogram("password_hash_duration_seconds", "bcrypt run time", labelnames=("op",))
+
+async def _run_bcrypt(op: str, function, *args):
+    global _in_flight
+    if _in_flight >= HASH_WORKERS + HASH_QUEUE_SIZE:
+        hash_rejected.inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many password requests, please try again shortly",
+            headers={"Retry-After": "1"}
+        )
+
+    submitted = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        result = function(*args)
+        return result, started - submitted, time.perf_counter() - started
+
+    _in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        result, waited, took = await loop.run_in_executor(_hash_executor, job)
+    finally:
+        _in_flight -= 1
+
+    hash_wait.observe(waited)
+    hash_duration.labels(op=op).observe(took)
+    return result
+
+async def hash_password_async(password: str) -> str:
+    return await _run_bcrypt("hash", hash_password, password)
+
+async def check_password_async(hashed_password: str, candidate_password: str) -> bool:
+    return await _run_bcrypt("check", check_password, hashed_password, candidate_password)
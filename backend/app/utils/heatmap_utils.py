@@ -0,0 +1,82 @@
+import json
+import time
+
+import cv2
+import numpy as np
+
+from backend.config import HEATMAP_HORIZONTAL_RANGE, HEATMAP_CACHE_MAX_ENTRIES, HEATMAP_CACHE_TTL
+
+# Sorted set of cached heatmap keys scored by last access, used for LRU eviction
+HEATMAP_LRU_KEY = "heatmap_cache:lru"
+
+
+def heatmap_cache_key(user_id: str, session_id: str, fmt: str, bins_x: int, bins_y: int, sigma: float) -> str:
+    # Keyed by owner too, so a cache hit is only possible for the session's owner
+    return f"heatmap:{user_id}:{session_id}:{fmt}:{bins_x}x{bins_y}:{sigma:g}"
+
+
+def gaze_histogram(records, bins_x: int, bins_y: int, sigma: float):
+    """
+    Bin the face-present gaze records into a (bins_y, bins_x) grid, smooth it with a
+    Gaussian of `sigma` bins and normalise to [0, 1]. Rows run top to bottom of the screen.
+    """
+    present = records["face"] == 1
+    x = records["x"][present].astype(np.float32)
+    y = records["y"][present].astype(np.float32)
+
+    grid, _, _ = np.histogram2d(
+        y, x,
+        bins=(bins_y, bins_x),
+        range=((0.0, 1.0), (-HEATMAP_HORIZONTAL_RANGE, HEATMAP_HORIZONTAL_RANGE))
+    )
+    grid = grid.astype(np.float32)
+    if sigma > 0:
+        grid = cv2.GaussianBlur(grid, (0, 0), sigmaX=sigma, sigmaY=sigma, borderType=cv2.BORDER_CONSTANT)
+
+    peak = grid.max()
+    if peak > 0:
+        grid /= peak
+    return grid, int(present.sum())
+
+
+def heatmap_png(grid, scale: int = 8) -> bytes:
+    image = cv2.applyColorMap((grid * 255).astype(np.uint8), cv2.COLORMAP_JET)
+    image = cv2.resize(image, (grid.shape[1] * scale, grid.shape[0] * scale), interpolation=cv2.INTER_LINEAR)
+    ok, encoded = cv2.imencode(".png", image)
+    if not ok:
+        raise RuntimeError("Could not encode heatmap")
+    return encoded.tobytes()
+
+
+def heatmap_grid_json(session_id: str, grid, points: int) -> bytes:
+    bins_y, bins_x = grid.shape
+    return json.dumps({
+        "session_id": session_id,
+        "points": points,
+        "bins_x": bins_x,
+        "bins_y": bins_y,
+        "grid": grid.astype(np.float64).round(4).tolist()
+    }).encode("utf-8")
+
+
+async def get_cached_heatmap(redis_conn, key: str):
+    # One round trip: fetch the entry and bump its recency if it exists
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.get(key)
+    pipe.zadd(HEATMAP_LRU_KEY, {key: time.time()}, xx=True)
+    cached, _ = await pipe.execute()
+    return cached
+
+
+async def cache_heatmap(redis_conn, key: str, payload: bytes):
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.set(key, payload, ex=HEATMAP_CACHE_TTL)
+    pipe.zadd(HEATMAP_LRU_KEY, {key: time.time()})
+    pipe.zcard(HEATMAP_LRU_KEY)
+    _, _, size = await pipe.execute()
+
+    overflow = size - HEATMAP_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        evicted = [member for member, _ in await redis_conn.zpopmin(HEATMAP_LRU_KEY, overflow)]
+        if evicted:
+            await redis_conn.delete(*evicted)
@@ -1,38 +1,93 @@
 import json
 import base64
+import struct
+import threading
 import numpy as np
 import cv2
 import mediapipe as mp
+from backend.app.utils.tracking_metrics import StageTimer
+from backend.config import FACE_PIPELINE_MODE
 
 
 mp_face = mp.solutions.face_detection
-face_detector = mp_face.FaceDetection(model_selection=0, min_detection_confidence=0.5)
+mp_face_mesh = mp.solutions.face_mesh
 
+# MediaPipe graphs are stateful and not safe to share between threads,
+# so every thread (and every inference worker process) gets its own pair.
+_graphs = threading.local()
 
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    max_num_faces=1,
-    refine_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
-
-def decode_base64_image_from_json(json_data: str):
+def get_face_detector():
+    if not hasattr(_graphs, "face_detector"):
+        _graphs.face_detector = mp_face.FaceDetection(model_selection=0, min_detection_confidence=0.5)
+    return _graphs.face_detector
+
+def get_face_mesh():
+    # Static image mode: a worker's graph sees frames from many sessions and ROI crops
+    # at shifting offsets, so landmarks tracked from the previous call would belong
+    # to some other image. Every frame is detected on its own.
+    if not hasattr(_graphs, "face_mesh"):
+        _graphs.face_mesh = mp_face_mesh.FaceMesh(
+            static_image_mode=True,
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=0.5
+        )
+    return _graphs.face_mesh
+
+def decode_base64_image_from_json(json_data: str, timer: StageTimer = None):
+    timer = timer or StageTimer()
     try:
         data = json.loads(json_data)
+        timer.mark("json_parse")
         image_data = data["image"]
         if "," in image_data:
             image_data = image_data.split(",")[1]
         image_bytes = base64.b64decode(image_data)
+        timer.mark("base64_decode")
         image_array = np.frombuffer(image_bytes, dtype=np.uint8)
-        return cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+        image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+        timer.mark("imdecode")
+        return image
     except Exception as e:
         print("Error decoding image:", e)
         return None
 
-def face_detection_box(frame):
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = face_detector.process(rgb)
+# Binary tracking frame: little-endian header followed by the raw JPEG bytes.
+# seq (uint32), capture timestamp in ms (float64), width (uint16), height (uint16)
+FRAME_HEADER = struct.Struct("<IdHH")
+
+def decode_binary_frame(message: bytes, timer: StageTimer = None):
+    """
+    Decode a binary tracking frame without going through JSON or base64.
+    The JPEG payload is viewed in place with np.frombuffer, so the only copy
+    is the one cv2.imdecode makes. Returns (header, image), or (None, None).
+    """
+    timer = timer or StageTimer()
+    try:
+        seq, timestamp, width, height = FRAME_HEADER.unpack_from(message)
+        image_array = np.frombuffer(message, dtype=np.uint8, offset=FRAME_HEADER.size)
+        image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+        timer.mark("imdecode")
+        if image is None:
+            return None, None
+        header = {"seq": seq, "timestamp": timestamp, "width": width, "height": height}
+        return header, image
+    except Exception as e:
+        print("Error decoding binary frame:", e)
+        return None, None
+
+def to_rgb(frame):
+    # Converts into a per-thread buffer that is reused while the frame size stays the same
+    rgb = getattr(_graphs, "rgb", None)
+    if rgb is None or rgb.shape != frame.shape:
+        rgb = np.empty_like(frame)
+        _graphs.rgb = rgb
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+
+def face_detection_box(frame, rgb=None):
+    if rgb is None:
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    results = get_face_detector().process(rgb)
     if results.detections:
         ih, iw, _ = frame.shape
         det = results.detections[0]
@@ -44,52 +99,169 @@ def face_detection_box(frame):
         return {"x": x, "y": y, "w": w, "h": h}
     return None
 
-def calculate_gaze_direction(face_landmarks, image_width, image_height):
-    def to_px(lm): return np.array([lm.x * image_width, lm.y * image_height])
-
-    l_iris = to_px(face_landmarks.landmark[468])
-    r_iris = to_px(face_landmarks.landmark[473])
-    l_inner, l_outer = to_px(face_landmarks.landmark[133]), to_px(face_landmarks.landmark[33])
-    r_inner, r_outer = to_px(face_landmarks.landmark[362]), to_px(face_landmarks.landmark[263])
-    l_upper, l_lower = to_px(face_landmarks.landmark[159]), to_px(face_landmarks.landmark[145])
-    r_upper, r_lower = to_px(face_landmarks.landmark[386]), to_px(face_landmarks.landmark[374])
-
-    def normalized_horizontal_position(iris, inner, outer):
-        eye_vec = outer - inner
-        eye_length = np.linalg.norm(eye_vec)
-        if eye_length == 0:
-            return 0.0
-        relative_iris_pos = np.dot(iris - inner, eye_vec) / eye_length
-        return (relative_iris_pos / eye_length)*2 - 1  # range [-1, 1]
-
-    def vertical_ratio(iris, upper, lower):
-        dist_total = np.linalg.norm(upper - lower)
-        return np.linalg.norm(iris - upper) / dist_total if dist_total != 0 else 0.5
-
-    l_h = normalized_horizontal_position(l_iris, l_inner, l_outer)
-    r_h = normalized_horizontal_position(r_iris, r_inner, r_outer)
-    l_v = vertical_ratio(l_iris, l_upper, l_lower)
-    r_v = vertical_ratio(r_iris, r_upper, r_lower)
-
-    h_ratio = l_h
-    v_ratio = (l_v + r_v) / 2
-
-    return {"horizontal": round(h_ratio,3), "vertical": round(v_ratio,3), 
+def landmark_box(face_landmarks, image_width, image_height):
+    # Tight box around the FaceMesh landmarks, in the same pixel format as face_detection_box
+    points = np.array([(lm.x, lm.y) for lm in face_landmarks.landmark], dtype=np.float32)
+    x0, y0 = np.clip(points.min(axis=0), 0.0, 1.0)
+    x1, y1 = np.clip(points.max(axis=0), 0.0, 1.0)
+    x = int(x0 * image_width)
+    y = int(y0 * image_height)
+    w = int(x1 * image_width) - x
+    h = int(y1 * image_height) - y
+    return {"x": x, "y": y, "w": w, "h": h}
+
+# Landmarks used for gaze, in the order of the (K,2) arrays below
+GAZE_LANDMARKS = [
+    468, 473,   # left / right iris
+    133, 33,    # left eye inner / outer corner
+    362, 263,   # right eye inner / outer corner
+    159, 145,   # left eye upper / lower lid
+    386, 374,   # right eye upper / lower lid
+]
+IRIS = [0, 1]
+INNER = [2, 4]
+OUTER = [3, 5]
+UPPER = [6, 8]
+LOWER = [7, 9]
+
+def gaze_points(face_landmarks, image_width, image_height):
+    """Pixel coordinates of GAZE_LANDMARKS as one (K,2) array."""
+    landmarks = face_landmarks.landmark
+    points = np.array([(landmarks[i].x, landmarks[i].y) for i in GAZE_LANDMARKS], dtype=np.float64)
+    points *= (image_width, image_height)
+    return points
+
+def gaze_ratios(points):
+    """
+    Vectorized gaze geometry for (K,2) points of one frame or (B,K,2) for a batch.
+    Returns (horizontal, vertical), each shaped (..., 2) as [left eye, right eye].
+    Horizontal is the iris position along the eye axis in [-1, 1],
+    vertical is the iris distance from the upper lid relative to the lid gap.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    iris = points[..., IRIS, :]
+    inner = points[..., INNER, :]
+    upper = points[..., UPPER, :]
+
+    eye_vec = points[..., OUTER, :] - inner
+    eye_length_sq = np.einsum("...i,...i->...", eye_vec, eye_vec)
+    projection = np.einsum("...i,...i->...", iris - inner, eye_vec)
+
+    lid_gap = np.linalg.norm(upper - points[..., LOWER, :], axis=-1)
+    iris_drop = np.linalg.norm(iris - upper, axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        horizontal = np.where(eye_length_sq != 0, projection / eye_length_sq * 2 - 1, 0.0)
+        vertical = np.where(lid_gap != 0, iris_drop / lid_gap, 0.5)
+    return horizontal, vertical
+
+def calculate_gaze_batch(points):
+    """
+    Gaze ratios for a (B,K,2) stack of frames, matching calculate_gaze_direction:
+    horizontal from the left eye, vertical averaged over both eyes. Returns two (B,) arrays.
+    """
+    horizontal, vertical = gaze_ratios(points)
+    return horizontal[..., 0], vertical.mean(axis=-1)
+
+def eye_openness(points):
+    """
+    Eye aspect ratio (lid gap over eye length) averaged over both eyes, for (K,2)
+    or (B,K,2) points. Around 0.25-0.35 for open eyes, close to 0 during a blink.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    lid_gap = np.linalg.norm(points[..., UPPER, :] - points[..., LOWER, :], axis=-1)
+    eye_length = np.linalg.norm(points[..., OUTER, :] - points[..., INNER, :], axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(eye_length != 0, lid_gap / eye_length, 0.0)
+    return ratio.mean(axis=-1)
+
+def calculate_gaze_direction(face_landmarks, image_width, image_height, offset=(0, 0), scale=1.0):
+    """
+    Gaze ratios and iris positions for one face. When the landmarks come from a crop
+    that was taken at `offset` of the full frame and resized by `scale`, the iris
+    positions are mapped back to full-frame pixels (the ratios are unaffected).
+    """
+    points = gaze_points(face_landmarks, image_width, image_height)
+    if scale != 1.0 or offset != (0, 0):
+        points = points / scale + offset
+    h_ratio, v_ratio = calculate_gaze_batch(points)
+    openness = eye_openness(points)
+    l_iris, r_iris = points[IRIS]
+
+    return {"horizontal": round(float(h_ratio),3), "vertical": round(float(v_ratio),3),
+    "openness": round(float(openness),3),
     "eyes" : {
     "left": {"x": float(l_iris[0]), "y": float(l_iris[1])},
     "right": {"x": float(r_iris[0]), "y": float(r_iris[1])}
 }}
 
-def detect_faces_and_gaze(frame):
+def to_frame_box(box, offset=(0, 0), scale=1.0):
+    # Map a box found in a crop/resized image back to full-frame pixels
+    if box is None or (scale == 1.0 and offset == (0, 0)):
+        return box
+    return {
+        "x": int(box["x"] / scale + offset[0]),
+        "y": int(box["y"] / scale + offset[1]),
+        "w": int(box["w"] / scale),
+        "h": int(box["h"] / scale),
+    }
+
+def detect_faces_and_gaze(
+    frame, mode: str = FACE_PIPELINE_MODE, offset=(0, 0), scale=1.0, timer: StageTimer = None,
+    periodic_check: bool = False
+):
+    """
+    Run gaze estimation on a BGR frame.
+
+    mode="dual" runs FaceMesh and FaceDetection on every frame (the original pipeline).
+    mode="single" converts to RGB once and takes the face box from the mesh landmarks,
+    running FaceDetection only when the mesh finds no face or `periodic_check` is set
+    (the caller's per-session FACE_DETECTION_INTERVAL cadence, see RoiTracker).
+
+    `frame` may be a region of a larger frame (see RoiTracker); results are reported
+    in full-frame pixels using its `offset` and `scale`.
+
+    Stage times (color, face_mesh, gaze, face_detector) are charged to `timer` if given.
+    """
+    timer = timer or StageTimer()
+    if mode == "dual":
+        return _detect_dual(frame, offset, scale, timer)
+
+    gaze_result = None
+    face_box = None
+    rgb = to_rgb(frame)
+    timer.mark("color")
+    mesh_results = get_face_mesh().process(rgb)
+    timer.mark("face_mesh")
+
+    ih, iw, _ = frame.shape
+    if mesh_results.multi_face_landmarks:
+        landmarks = mesh_results.multi_face_landmarks[0]
+        gaze_result = calculate_gaze_direction(landmarks, iw, ih, offset, scale)
+        face_box = landmark_box(landmarks, iw, ih)
+        timer.mark("gaze")
+
+    if face_box is None or periodic_check:
+        face_box = face_detection_box(frame, rgb) or face_box
+        timer.mark("face_detector")
+
+    return {"gaze": gaze_result, "face_box": to_frame_box(face_box, offset, scale)}
+
+def _detect_dual(frame, offset=(0, 0), scale=1.0, timer: StageTimer = None):
+    timer = timer or StageTimer()
     gaze_result = None
     rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    mesh_results = face_mesh.process(rgb)
+    timer.mark("color")
+    mesh_results = get_face_mesh().process(rgb)
+    timer.mark("face_mesh")
 
     if mesh_results.multi_face_landmarks:
         ih, iw, _ = frame.shape
         landmarks = mesh_results.multi_face_landmarks[0]
-        gaze_result = calculate_gaze_direction(landmarks, iw, ih)
+        gaze_result = calculate_gaze_direction(landmarks, iw, ih, offset, scale)
+        timer.mark("gaze")
 
     face_box = face_detection_box(frame)
+    timer.mark("face_detector")
 
-    return {"gaze": gaze_result, "face_box": face_box}
+    return {"gaze": gaze_result, "face_box": to_frame_box(face_box, offset, scale)}
@@ -0,0 +1,229 @@
+import asyncio
+import math
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import WebSocket
+from backend.app.utils import image_utils
+from backend.app.utils.metrics import Gauge, Histogram
+from backend.app.utils.tracking_metrics import StageTimer, observe_stages
+from backend.config import (
+    INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE, INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS,
+)
+
+
+def _init_worker():
+    # Build the MediaPipe graphs up front so the first frame doesn't pay for it
+    image_utils.get_face_mesh()
+    image_utils.get_face_detector()
+
+def _run_batch(jobs):
+    # Errors are returned per frame so one bad frame doesn't fail the whole batch.
+    # Stage timings ride along with each result; metrics are recorded in the parent.
+    results = []
+    for frame, offset, scale, periodic_check in jobs:
+        timer = StageTimer()
+        try:
+            result = image_utils.detect_faces_and_gaze(
+                frame, offset=offset, scale=scale, timer=timer, periodic_check=periodic_check
+            )
+            results.append((result, timer.times))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+inference_queue_depth = Gauge("inference_queue_depth", "Frames waiting to be batched for inference")
+inference_queue_wait = Histogram("inference_queue_wait_seconds", "Time frames waited before their batch was dispatched")
+inference_batch_size = Histogram(
+    "inference_batch_size", "Frames per dispatched batch",
+    buckets=tuple(range(1, INFERENCE_MAX_BATCH_SIZE + 1))
+)
+inference_batch_occupancy = Histogram(
+    "inference_batch_occupancy_ratio", "Batch size as a fraction of INFERENCE_MAX_BATCH_SIZE",
+    buckets=(0.125, 0.25, 0.5, 0.75, 1.0)
+)
+inference_batch_duration = Histogram("inference_batch_duration_seconds", "Worker time per batch")
+
+
+class _PendingFrame:
+    __slots__ = ("session_id", "job", "future", "enqueued")
+
+    def __init__(self, session_id, job, future):
+        self.session_id = session_id
+        self.job = job
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class InferenceEngine:
+    """
+    Runs detect_faces_and_gaze in a pool of worker processes with warm MediaPipe
+    graphs so that inference never blocks the event loop.
+
+    Frames from every tracking socket go into one FIFO queue, and a scheduler task
+    dispatches them to a worker whenever one is free, oldest frame first and at
+    most one frame per session per batch.
+
+    A worker runs its batch one frame after another (MediaPipe has no batched
+    inference), so batches only exist to save IPC round trips when there are more
+    frames than workers: each takes its share of the queue, ceil(queued / workers),
+    up to `max_batch_size`. While other workers are idle a frame is dispatched
+    immediately; only when the last free worker is taken does the scheduler wait
+    up to `max_wait_ms` after the oldest frame for the queue to reach one frame per
+    worker. At most `queue_size` frames wait at once; further callers block.
+    """
+
+    def __init__(
+        self,
+        workers: int = INFERENCE_WORKERS,
+        queue_size: int = INFERENCE_QUEUE_SIZE,
+        max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms: float = INFERENCE_MAX_WAIT_MS
+    ):
+        self.workers = max(1, workers)
+        self.max_batch_size = max(1, max_batch_size)
+        self.queue_size = max(self.max_batch_size, queue_size)
+        self.max_wait = max_wait_ms / 1000
+        self._executor = None
+        self._queue = deque()
+        self._queue_slots = None
+        self._free_workers = None
+        self._wakeup = None
+        self._scheduler = None
+        self._idle_workers = self.workers
+        self._dispatches = set()
+
+    def start(self):
+        # "spawn" keeps the workers free of any MediaPipe state from the parent
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        self._queue_slots = asyncio.Semaphore(self.queue_size)
+        self._free_workers = asyncio.Semaphore(self.workers)
+        self._wakeup = asyncio.Event()
+        self._idle_workers = self.workers
+        self._scheduler = asyncio.create_task(self._schedule())
+        inference_queue_depth.set_function(lambda: len(self._queue))
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            self._scheduler = None
+        for task in self._dispatches:
+            task.cancel()
+        self._dispatches.clear()
+        while self._queue:
+            item = self._queue.popleft()
+            if not item.future.done():
+                item.future.set_exception(RuntimeError("Inference engine is shutting down"))
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    async def detect_faces_and_gaze(
+        self, frame, session_id: str = None, offset=(0, 0), scale: float = 1.0, periodic_check: bool = False
+    ):
+        """
+        Queue a frame (or a face crop, with the offset/scale that maps it back to
+        the full frame) and wait for its detect_faces_and_gaze result.
+        """
+        if self._executor is None:
+            raise RuntimeError("Inference engine is not running")
+
+        async with self._queue_slots:
+            future = asyncio.get_running_loop().create_future()
+            self._queue.append(_PendingFrame(session_id, (frame, offset, scale, periodic_check), future))
+            self._wakeup.set()
+            return await future
+
+    async def _schedule(self):
+        while True:
+            while not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            await self._free_workers.acquire()
+            self._idle_workers -= 1
+
+            # Batch up only when no other worker could take the frames right now
+            while self._queue and self._idle_workers == 0 and len(self._queue) < self.workers:
+                remaining = self._queue[0].enqueued + self.max_wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = self._take_batch(min(self.max_batch_size, math.ceil(len(self._queue) / self.workers)))
+            if batch:
+                task = asyncio.create_task(self._dispatch(batch))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+            else:
+                self._release_worker()
+
+    def _release_worker(self):
+        self._idle_workers += 1
+        self._free_workers.release()
+
+    def _take_batch(self, size: int):
+        batch = []
+        sessions = set()
+        deferred = []
+        while self._queue and len(batch) < size:
+            item = self._queue.popleft()
+            if item.future.done():
+                continue  # caller went away
+            if item.session_id is not None and item.session_id in sessions:
+                deferred.append(item)
+                continue
+            sessions.add(item.session_id)
+            batch.append(item)
+        self._queue.extendleft(reversed(deferred))
+        return batch
+
+    async def _dispatch(self, batch):
+        now = time.monotonic()
+        for item in batch:
+            inference_queue_wait.observe(now - item.enqueued)
+        inference_batch_size.observe(len(batch))
+        inference_batch_occupancy.observe(len(batch) / self.max_batch_size)
+
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self._executor, _run_batch, [item.job for item in batch])
+        except asyncio.CancelledError:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(RuntimeError("Inference engine is shutting down"))
+            raise
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            inference_batch_duration.observe(time.monotonic() - now)
+            self._release_worker()
+
+        for item, result in zip(batch, results):
+            if item.future.done():
+                continue
+            if isinstance(result, Exception):
+                item.future.set_exception(result)
+            else:
+                result, stage_times = result
+                observe_stages(stage_times)
+                item.future.set_result(result)
+
+
+def get_inference_engine(websocket: WebSocket) -> InferenceEngine:
+    return websocket.app.state.inference_engine
@@ -1,5 +1,6 @@
 
 from jose import jwt
+from jose.constants import ALGORITHMS
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import os
@@ -18,4 +19,11 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 def jwt_decode(token:str):
-    return jwt.decode(token, SECRET_KEY, ALGORITHM)
\ No newline at end of file
+    return jwt.decode(token, SECRET_KEY, ALGORITHM)
+
+def validate_jwt_settings():
+    # Called at startup so a bad .env fails fast instead of on the first login
+    if not SECRET_KEY:
+        raise RuntimeError("SECRET_KEY is not set")
+    if ALGORITHM not in ALGORITHMS.HMAC:
+        raise RuntimeError(f"ALGORITHM must be one of {sorted(ALGORITHMS.HMAC)}, got {ALGORITHM!r}")
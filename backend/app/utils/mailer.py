@@ -2,13 +2,14 @@ import smtplib
 from email.message import EmailMessage
 from dotenv import load_dotenv
 import os
+from backend.config import EMAIL_TRANSPORT, SMTP_HOST, SMTP_PORT, SMTP_SSL, SMTP_TIMEOUT
 
 load_dotenv()
 
 company_email = os.environ.get("COMPANY_EMAIL")
 email_password = os.environ.get("EMAIL_PASSWORD")
 
-def send_password_reset_email(email: str, token: str):
+def build_password_reset_email(email: str, token: str) -> EmailMessage:
     msg = EmailMessage()
     msg["Subject"] = "Reset Your Password"
     msg["From"] = company_email
@@ -34,12 +35,88 @@ def send_password_reset_email(email: str, token: str):
     </html>
     """
     msg.add_alternative(html_content, subtype="html")
+    return msg
+
+def send_password_reset_email(email: str, token: str):
+    # Synchronous one-off send; request handlers go through email_queue instead
+    transport = SMTPTransport()
+    try:
+        transport.send(build_password_reset_email(email, token))
+    finally:
+        transport.close()
+
+
+class SMTPTransport:
+    """
+    Sends through one SMTP connection that is kept open between sends and
+    re-established when the server drops it. Not thread-safe: use it from one
+    worker at a time.
+    """
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        use_ssl: bool = SMTP_SSL,
+        username: str = company_email,
+        password: str = email_password,
+        timeout: float = SMTP_TIMEOUT
+    ):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self._smtp = None
+
+    def _connect(self):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        smtp = smtp_class(self.host, self.port, timeout=self.timeout)
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        self._smtp = smtp
 
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-        smtp.login(company_email, email_password)
+    def send(self, msg: EmailMessage):
+        if self._smtp is None:
+            self._connect()
         try:
-            smtp.send_message(msg)
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Idle connections get closed server-side; reconnect once and retry
+            self._smtp = None
+            self._connect()
+            self._smtp.send_message(msg)
         except smtplib.SMTPRecipientsRefused:
-            raise ValueError(f"Recipient email address '{email}' was refused by the SMTP server.")
+            raise ValueError(f"Recipient email address '{msg['To']}' was refused by the SMTP server.")
         except smtplib.SMTPException as e:
             raise RuntimeError(f"Failed to send email: {e}")
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+class MemoryTransport:
+    """Keeps sent messages in `outbox` instead of delivering them (tests, local development)."""
+
+    def __init__(self):
+        self.outbox = []
+
+    def send(self, msg: EmailMessage):
+        self.outbox.append(msg)
+
+    def close(self):
+        pass
+
+
+def create_transport(kind: str = EMAIL_TRANSPORT):
+    if kind == "smtp":
+        return SMTPTransport()
+    if kind == "memory":
+        return MemoryTransport()
+    raise ValueError(f"Unknown EMAIL_TRANSPORT {kind!r}")
@@ -0,0 +1,90 @@
+import time
+
+from backend.config import (
+    RATE_MAX_FPS, RATE_MIN_FPS, RATE_IDLE_FPS, RATE_IDLE_AFTER, RATE_STABLE_DELTA, RATE_OPENNESS_DELTA,
+    RATE_CONTROL_INTERVAL,
+)
+
+# Capture settings the client steps down through as the inference queue fills up
+WIDTH_LEVELS = (640, 480, 320)
+QUALITY_LEVELS = (0.8, 0.7, 0.6)
+PRESSURE_LEVELS = (0.25, 0.6)
+
+
+def _pressure_level(pressure: float) -> int:
+    return sum(pressure >= threshold for threshold in PRESSURE_LEVELS)
+
+def _gaze_moved(previous, current) -> bool:
+    # Eyelid movement counts too: at the idle rate blinks would go unseen (see BlinkTracker)
+    if previous is None or current is None:
+        return (previous is None) != (current is None)
+    return (
+        abs(current["horizontal"] - previous["horizontal"]) > RATE_STABLE_DELTA
+        or abs(current["vertical"] - previous["vertical"]) > RATE_STABLE_DELTA
+        or abs(current.get("openness", 0.0) - previous.get("openness", 0.0)) > RATE_OPENNESS_DELTA
+    )
+
+
+class RateController:
+    """
+    Decides how fast, how large and at what JPEG quality a tracking client should
+    send frames. Inputs are this session's processing time per frame (EWMA), the
+    global inference queue pressure (0..1) and how long the gaze (including eye
+    openness) has been stable.
+    update() returns a control message when the target changes, at most once per
+    RATE_CONTROL_INTERVAL, and None otherwise.
+    """
+
+    def __init__(self):
+        self.processing_time = None
+        self.current = None
+        self._last_gaze = None
+        self._stable_since = time.monotonic()
+        self._last_sent = 0.0
+
+    def observe(self, processing_time: float, gaze, now: float = None):
+        now = time.monotonic() if now is None else now
+        if self.processing_time is None:
+            self.processing_time = processing_time
+        else:
+            self.processing_time += 0.2 * (processing_time - self.processing_time)
+
+        if _gaze_moved(self._last_gaze, gaze):
+            self._stable_since = now
+        self._last_gaze = gaze
+
+    def target(self, pressure: float, now: float = None) -> dict:
+        now = time.monotonic() if now is None else now
+        level = _pressure_level(pressure)
+
+        fps = float(RATE_MAX_FPS)
+        if self.processing_time:
+            # Frames sent faster than one inference time would only be dropped
+            fps = min(fps, 1.0 / self.processing_time)
+        fps *= max(0.25, 1.0 - pressure)
+        if now - self._stable_since >= RATE_IDLE_AFTER:
+            fps = min(fps, RATE_IDLE_FPS)
+
+        return {
+            "fps": max(RATE_MIN_FPS, min(RATE_MAX_FPS, int(fps))),
+            "width": WIDTH_LEVELS[level],
+            "quality": QUALITY_LEVELS[level],
+        }
+
+    def update(self, processing_time: float, gaze, pressure: float):
+        now = time.monotonic()
+        self.observe(processing_time, gaze, now)
+        if now - self._last_sent < RATE_CONTROL_INTERVAL:
+            return None
+
+        target = self.target(pressure, now)
+        if target == self.current:
+            return None
+        self.current = target
+        self._last_sent = now
+        return target
+
+    def initial(self) -> dict:
+        self.current = self.target(0.0)
+        self._last_sent = time.monotonic()
+        return self.current
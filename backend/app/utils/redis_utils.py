@@ -1,5 +1,24 @@
-import redis
-from fastapi import Request
+import redis.asyncio as redis
+from starlette.requests import HTTPConnection
+from backend.config import (
+    REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_MAX_CONNECTIONS, REDIS_POOL_TIMEOUT,
+    REDIS_SOCKET_TIMEOUT, REDIS_SOCKET_CONNECT_TIMEOUT, REDIS_HEALTH_CHECK_INTERVAL,
+)
 
-def get_redis_connection(request: Request) -> redis.Redis:
-    return request.app.state.redis
\ No newline at end of file
+def create_redis_client() -> redis.Redis:
+    # Callers wait up to REDIS_POOL_TIMEOUT for a free connection instead of failing
+    pool = redis.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    )
+    return redis.Redis(connection_pool=pool)
+
+def get_redis_connection(connection: HTTPConnection) -> redis.Redis:
+    # HTTPConnection so the same dependency works for HTTP routes and WebSockets
+    return connection.app.state.redis
@@ -0,0 +1,68 @@
+import cv2
+
+from backend.config import INFERENCE_TARGET_WIDTH, ROI_TARGET_SIZE, ROI_PADDING, FACE_DETECTION_INTERVAL
+
+
+class RoiTracker:
+    """
+    Per-session face region tracking. While a face is being tracked, only a padded
+    crop around its last box is sent to inference; otherwise the whole frame is.
+    Either way the image is downscaled to a target size first. prepare() returns
+    the image plus the (offset, scale) needed to map results back to full-frame pixels.
+
+    It also keeps the session's FACE_DETECTION_INTERVAL cadence: inference workers
+    are shared between sessions, so they can't count a session's frames themselves.
+    """
+
+    def __init__(
+        self,
+        target_width: int = INFERENCE_TARGET_WIDTH,
+        roi_size: int = ROI_TARGET_SIZE,
+        padding: float = ROI_PADDING,
+        detection_interval: int = FACE_DETECTION_INTERVAL
+    ):
+        self.target_width = target_width
+        self.roi_size = roi_size
+        self.padding = padding
+        self.detection_interval = detection_interval
+        self.box = None
+        self._inferences = 0
+
+    @property
+    def tracking(self) -> bool:
+        return self.box is not None
+
+    def reset(self):
+        self.box = None
+
+    def detection_due(self) -> bool:
+        """Call once per inference; True every detection_interval-th time (never if 0)."""
+        self._inferences += 1
+        return self.detection_interval > 0 and self._inferences % self.detection_interval == 0
+
+    def update(self, face_box):
+        # A lost face drops back to full-frame detection on the next frame
+        self.box = face_box if face_box and face_box["w"] > 0 and face_box["h"] > 0 else None
+
+    def prepare(self, frame):
+        ih, iw = frame.shape[:2]
+
+        if self.box is None:
+            region, offset = frame, (0, 0)
+            scale = min(1.0, self.target_width / iw)
+        else:
+            pad_x = int(self.box["w"] * self.padding)
+            pad_y = int(self.box["h"] * self.padding)
+            x0 = max(self.box["x"] - pad_x, 0)
+            y0 = max(self.box["y"] - pad_y, 0)
+            x1 = min(self.box["x"] + self.box["w"] + pad_x, iw)
+            y1 = min(self.box["y"] + self.box["h"] + pad_y, ih)
+            if x1 <= x0 or y1 <= y0:
+                self.box = None
+                return self.prepare(frame)
+            region, offset = frame[y0:y1, x0:x1], (x0, y0)
+            scale = min(1.0, self.roi_size / max(x1 - x0, y1 - y0))
+
+        if scale < 1.0:
+            region = cv2.resize(region, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return region, offset, scale
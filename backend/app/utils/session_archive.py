@@ -0,0 +1,385 @@
+import asyncio
+import base64
+import json
+import sqlite3
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import redis.asyncio as redis
+from starlette.requests import HTTPConnection
+
+from backend.app.utils.gaze_store import gaze_series_key, gaze_origin_key
+from backend.app.utils.metrics import Counter
+from backend.app.utils.session_bus import session_stream_key
+from backend.app.utils.session_index import session_index_key, start_time_score, index_session
+from backend.app.utils.session_store import (
+    SessionStillTracked, session_key, decode_session_hash, read_session, complete_session
+)
+from backend.config import (
+    ARCHIVE_PATH, ARCHIVE_AFTER, ARCHIVE_BATCH_SIZE, ARCHIVE_INTERVAL, ARCHIVE_PROMOTE_TTL,
+    ARCHIVE_URL, ARCHIVE_SECRET, ARCHIVE_TIMEOUT, SESSION_EXPIRE_GRACE,
+)
+
+# Cold tier for completed sessions. Redis keeps active and recently completed
+# sessions; the archiver moves older ones into SQLite (all hash fields and the gaze
+# series, zlib-compressed) and deletes their Redis keys and index entries.
+# Readers fall back to the archive, and promote_session copies an archived session
+# back into Redis with a TTL so repeated reads (report, heatmap) hit Redis again.
+#
+# The archive is a local file owned by one host, which runs the archiver. Other hosts
+# set ARCHIVE_URL to that host and read through its /internal/archive endpoints
+# (RemoteSessionArchive), so archived sessions resolve the same everywhere.
+
+# Completed sessions scored by end time, so the archiver never scans session:*
+COMPLETED_SESSIONS_KEY = "sessions_completed"
+# Active sessions scored by when they go stale (planned end + SESSION_EXPIRE_GRACE),
+# so sessions that were never ended still get completed and archived
+ACTIVE_SESSIONS_KEY = "sessions_active"
+ARCHIVE_LOCK_KEY = "session_archive:lock"
+
+SUMMARY_FIELDS = ("user_id", "start_time", "session_duration", "status")
+
+# Deletes the archiver lock only if this archiver still holds it
+_RELEASE_LOCK = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+sessions_archived = Counter("sessions_archived_total", "Sessions moved from Redis to the archive")
+sessions_promoted = Counter("sessions_promoted_total", "Archived sessions copied back into Redis on read")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    start_score REAL NOT NULL,
+    session_duration INTEGER,
+    status TEXT,
+    end_time TEXT,
+    fields BLOB NOT NULL,
+    gaze_origin INTEGER,
+    gaze BLOB
+);
+CREATE INDEX IF NOT EXISTS sessions_by_user_start ON sessions (user_id, start_score DESC);
+"""
+
+
+def mark_completed(redis_conn, session_id: str, end_time: str):
+    """Queue a session for archiving. Works on a client or a pipeline."""
+    # start_time_score just turns an ISO timestamp into epoch seconds
+    return redis_conn.zadd(COMPLETED_SESSIONS_KEY, {session_id: start_time_score(end_time)})
+
+
+def planned_end(start_time: str, session_duration) -> float:
+    """Epoch seconds at which a session was due to end (session_duration is in minutes)."""
+    return start_time_score(start_time) + int(session_duration) * 60
+
+def mark_active(redis_conn, session_id: str, start_time: str, session_duration, grace: float = SESSION_EXPIRE_GRACE):
+    """Schedule an active session for completion if nobody ends it. Works on a client or a pipeline."""
+    return redis_conn.zadd(ACTIVE_SESSIONS_KEY, {session_id: planned_end(start_time, session_duration) + grace})
+
+
+class SessionArchive:
+    """
+    SQLite store of archived sessions. All access goes through one dedicated thread
+    (SQLite connections are single-threaded), so the async methods never block the
+    event loop and never run concurrently.
+    """
+
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def close(self):
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+    def _store(self, rows):
+        db = self._connect()
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    async def store(self, sessions):
+        """Archive (session_id, session dict, gaze_origin, gaze bytes) tuples in one transaction."""
+        rows = []
+        for session_id, session, origin, gaze in sessions:
+            rows.append((
+                session_id,
+                session["user_id"],
+                session["start_time"],
+                start_time_score(session["start_time"]),
+                session.get("session_duration"),
+                session.get("status"),
+                session.get("end_time"),
+                zlib.compress(json.dumps(session).encode("utf-8")),
+                origin,
+                zlib.compress(gaze) if gaze else None,
+            ))
+        await self._run(self._store, rows)
+
+    def _load(self, session_id: str):
+        row = self._connect().execute(
+            "SELECT fields, gaze_origin, gaze FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        fields, origin, gaze = row
+        return json.loads(zlib.decompress(fields)), origin, zlib.decompress(gaze) if gaze else None
+
+    async def load(self, session_id: str):
+        """(session dict, gaze_origin, gaze bytes) of an archived session, or None."""
+        return await self._run(self._load, session_id)
+
+    def _list_user_sessions(self, user_id: str, before, limit: int):
+        return self._connect().execute(
+            "SELECT session_id, start_score, user_id, start_time, session_duration, status FROM sessions "
+            "WHERE user_id = ? AND start_score < ? ORDER BY start_score DESC LIMIT ?",
+            (user_id, float("inf") if before is None else before, limit)
+        ).fetchall()
+
+    async def list_user_sessions(self, user_id: str, before=None, limit: int = 50):
+        """
+        One page of a user's archived sessions, newest first, as (session_id, score,
+        summary) with the same score and summary fields as the Redis session index.
+        """
+        rows = await self._run(self._list_user_sessions, user_id, before, limit)
+        return [
+            (session_id, score, dict(zip(SUMMARY_FIELDS, summary)))
+            for session_id, score, *summary in rows
+        ]
+
+
+class RemoteSessionArchive:
+    """
+    Read-only view of the archive owned by another host (ARCHIVE_URL), through its
+    /internal/archive endpoints authenticated with ARCHIVE_SECRET. Same read
+    interface as SessionArchive; requests run in a thread.
+    """
+
+    def __init__(self, url: str = ARCHIVE_URL, secret: str = ARCHIVE_SECRET, timeout: float = ARCHIVE_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.secret = secret
+        self.timeout = timeout
+
+    def _get(self, path: str, params: dict = None):
+        url = f"{self.url}/internal/archive{path}"
+        if params:
+            url += "?" + urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        request = urllib.request.Request(url, headers={"X-Archive-Secret": self.secret})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    async def store(self, sessions):
+        raise RuntimeError("Sessions are only archived by the host that owns the archive")
+
+    async def load(self, session_id: str):
+        data = await asyncio.to_thread(self._get, f"/sessions/{urllib.parse.quote(session_id, safe='')}")
+        if data is None:
+            return None
+        gaze = base64.b64decode(data["gaze"]) if data["gaze"] else None
+        return data["session"], data["gaze_origin"], gaze
+
+    async def list_user_sessions(self, user_id: str, before=None, limit: int = 50):
+        try:
+            data = await asyncio.to_thread(
+                self._get, f"/users/{urllib.parse.quote(user_id, safe='')}/sessions",
+                {"before": before, "limit": limit}
+            )
+        except Exception as e:
+            # Listings degrade to the sessions still in Redis rather than failing
+            print(f"❌ Could not list archived sessions from {self.url}: {e}")
+            return []
+        return [(row["session_id"], row["score"], row["summary"]) for row in data or []]
+
+    async def close(self):
+        pass
+
+
+def create_session_archive():
+    return RemoteSessionArchive() if ARCHIVE_URL else SessionArchive()
+
+
+async def promote_session(redis_conn: redis.Redis, archive: SessionArchive, session_id: str) -> bool:
+    """
+    Copy an archived session (hash and gaze series) back into Redis for
+    ARCHIVE_PROMOTE_TTL seconds. It is not re-indexed or re-queued for archiving;
+    it simply expires again. Returns False if the session isn't archived.
+    """
+    archived = await archive.load(session_id)
+    if archived is None:
+        return False
+    session, origin, gaze = archived
+
+    pipe = redis_conn.pipeline()
+    pipe.hset(session_key(session_id), mapping={k: v for k, v in session.items() if v is not None})
+    pipe.expire(session_key(session_id), ARCHIVE_PROMOTE_TTL)
+    if origin is not None:
+        pipe.set(gaze_origin_key(session_id), origin, ex=ARCHIVE_PROMOTE_TTL)
+    if gaze:
+        pipe.set(gaze_series_key(session_id), gaze, ex=ARCHIVE_PROMOTE_TTL)
+    await pipe.execute()
+    sessions_promoted.inc()
+    return True
+
+async def read_through(redis_conn: redis.Redis, archive: SessionArchive, session_id: str, fields):
+    """read_session, promoting the session from the archive on a miss."""
+    session = await read_session(redis_conn, session_id, fields)
+    if session is None and await promote_session(redis_conn, archive, session_id):
+        session = await read_session(redis_conn, session_id, fields)
+    return session
+
+
+class SessionArchiver:
+    """
+    Background task that archives sessions completed more than `archive_after`
+    seconds ago, `batch_size` at a time. A short Redis lock keeps concurrent
+    workers from archiving the same batch.
+
+    Each run first completes stale sessions: active ones whose planned end passed
+    more than SESSION_EXPIRE_GRACE seconds ago (the client never called
+    /session/end) and that no tracking socket holds, as of their planned end.
+    """
+
+    def __init__(
+        self,
+        redis_conn: redis.Redis,
+        archive: SessionArchive,
+        archive_after: float = ARCHIVE_AFTER,
+        batch_size: int = ARCHIVE_BATCH_SIZE,
+        interval: float = ARCHIVE_INTERVAL
+    ):
+        self.redis = redis_conn
+        self.archive = archive
+        self.archive_after = archive_after
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task = None
+        self._token = uuid.uuid4().hex
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                while await self.complete_stale_sessions() == self.batch_size:
+                    pass
+                while await self.archive_batch() == self.batch_size:
+                    pass  # keep going while there is a backlog
+            except Exception as e:
+                print(f"❌ Session archiver error: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def complete_stale_sessions(self, now: float = None) -> int:
+        now = time.time() if now is None else now
+        stale = await self.redis.zrangebyscore(ACTIVE_SESSIONS_KEY, "-inf", now, start=0, num=self.batch_size)
+        # Sessions still being tracked stay queued and don't count, so the caller's
+        # "until a short batch" loop can't spin on them
+        handled = 0
+        for member in stale:
+            session_id = member.decode("utf-8")
+            pipe = self.redis.pipeline(transaction=False)
+            session = await read_session(self.redis, session_id, ("start_time", "session_duration"))
+            if session is not None:
+                end = planned_end(session["start_time"], session["session_duration"])
+                end_time = datetime.fromtimestamp(end, timezone.utc).isoformat()
+                try:
+                    completed_now, session = await complete_session(self.redis, session_id, end_time)
+                except SessionStillTracked:
+                    continue  # looked at again on the next run
+                if completed_now:
+                    mark_completed(pipe, session_id, end_time)
+                    index_session(pipe, session["user_id"], session_id, session["start_time"], only_new=True)
+                    print(f"✅ Completed stale session {session_id}")
+            pipe.zrem(ACTIVE_SESSIONS_KEY, session_id)
+            await pipe.execute()
+            handled += 1
+        return handled
+
+    async def archive_batch(self, now: float = None) -> int:
+        now = time.time() if now is None else now
+        if not await self.redis.set(ARCHIVE_LOCK_KEY, self._token, nx=True, ex=max(60, int(self.interval))):
+            return 0
+        try:
+            due = await self.redis.zrangebyscore(
+                COMPLETED_SESSIONS_KEY, "-inf", now - self.archive_after, start=0, num=self.batch_size
+            )
+            session_ids = [member.decode("utf-8") for member in due]
+            if not session_ids:
+                return 0
+
+            pipe = self.redis.pipeline(transaction=False)
+            for session_id in session_ids:
+                pipe.hgetall(session_key(session_id))
+                pipe.get(gaze_origin_key(session_id))
+                pipe.get(gaze_series_key(session_id))
+            replies = await pipe.execute()
+
+            batch = []
+            for i, session_id in enumerate(session_ids):
+                values, origin, gaze = replies[3 * i:3 * i + 3]
+                session = decode_session_hash(values)
+                if session.get("user_id") is None:
+                    continue  # already gone
+                batch.append((session_id, session, int(origin) if origin else None, gaze))
+
+            # Write the archive first: a crash in between leaves a duplicate, never a loss
+            await self.archive.store(batch)
+
+            pipe = self.redis.pipeline(transaction=False)
+            for session_id, session, _, _ in batch:
+                pipe.zrem(session_index_key(session["user_id"]), session_id)
+                pipe.delete(
+                    session_key(session_id), gaze_origin_key(session_id),
+                    gaze_series_key(session_id), session_stream_key(session_id),
+                )
+            pipe.zrem(COMPLETED_SESSIONS_KEY, *session_ids)
+            await pipe.execute()
+
+            sessions_archived.inc(len(batch))
+            print(f"✅ Archived {len(batch)} sessions")
+            return len(session_ids)
+        finally:
+            await self.redis.eval(_RELEASE_LOCK, 1, ARCHIVE_LOCK_KEY, self._token)
+
+
+def get_session_archive(connection: HTTPConnection) -> SessionArchive:
+    return connection.app.state.session_archive
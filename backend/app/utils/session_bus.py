@@ -0,0 +1,254 @@
+import asyncio
+import os
+import time
+import uuid
+
+import redis.asyncio as redis
+from starlette.requests import HTTPConnection
+
+from backend.config import BUS_PUBLISH_INTERVAL, BUS_STREAM_MAXLEN, BUS_STREAM_TTL, SESSION_LEASE_MS
+
+# Cross-process view of live tracking sessions. The worker that owns a session's
+# tracking socket (see SessionLease) publishes compact per-frame results to the
+# session_stream:{id} Redis stream; any worker can read it: live observers through the
+# process's SessionStreamHub, external aggregators with read_session_stream. Entries are
+#   {"t": epoch ms, "s": focus state, "h": horizontal, "v": vertical}
+# with h/v left out when no face was found, and a final {"event": "end"}.
+
+END_EVENT = "end"
+
+# Identifies this process in lease values, so a lease is only renewed/released by its owner
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def session_stream_key(session_id: str) -> str:
+    return f"session_stream:{session_id}"
+
+def session_owner_key(session_id: str) -> str:
+    return f"session_owner:{session_id}"
+
+
+class SessionPublisher:
+    """
+    Buffers one session's results and writes them as stream entries in a single
+    pipeline every BUS_PUBLISH_INTERVAL seconds (TrackingState.publish), so
+    publishing costs one round trip per interval rather than one per frame.
+    Entries stay buffered until flushed() confirms the write.
+    """
+
+    def __init__(self, session_id: str, interval: float = BUS_PUBLISH_INTERVAL):
+        self.key = session_stream_key(session_id)
+        self.interval = interval
+        self._entries = []
+        self._flushing = 0
+        self._last_publish = time.monotonic()
+
+    def add(self, gaze, state: str, now_ms: int = None):
+        entry = {"t": int(time.time() * 1000) if now_ms is None else now_ms, "s": state}
+        if gaze is not None:
+            entry["h"] = gaze["horizontal"]
+            entry["v"] = gaze["vertical"]
+        self._entries.append(entry)
+
+    def end(self):
+        self._entries.append({"t": int(time.time() * 1000), "event": END_EVENT})
+
+    def publish_due(self) -> bool:
+        return bool(self._entries) and time.monotonic() - self._last_publish >= self.interval
+
+    def flush_into(self, pipe):
+        self._last_publish = time.monotonic()
+        self._flushing = len(self._entries)
+        if not self._entries:
+            return
+        for entry in self._entries:
+            pipe.xadd(self.key, entry, maxlen=BUS_STREAM_MAXLEN, approximate=True)
+        pipe.expire(self.key, BUS_STREAM_TTL)
+
+    def flushed(self):
+        del self._entries[:self._flushing]
+        self._flushing = 0
+
+
+def _decode_entry(fields: dict) -> dict:
+    entry = {key.decode(): value.decode() for key, value in fields.items()}
+    decoded = {"t": int(entry["t"])}
+    if "event" in entry:
+        decoded["event"] = entry["event"]
+        return decoded
+    decoded["state"] = entry["s"]
+    decoded["gaze"] = (
+        {"horizontal": float(entry["h"]), "vertical": float(entry["v"])} if "h" in entry else None
+    )
+    return decoded
+
+async def read_session_stream(redis_conn: redis.Redis, session_id: str, last_id: str = "$", block_ms: int = 2000, count: int = 100):
+    """
+    Yield (entry_id, entry) for new stream entries, starting after `last_id`
+    ("$" = only entries published from now on, "0" = from the start of the stream).
+    Stops after the end event. block_ms stays below REDIS_SOCKET_TIMEOUT.
+
+    Each reader holds a connection for as long as it runs, so this is for standalone
+    consumers; inside the app, observers share one read through SessionStreamHub.
+    """
+    key = session_stream_key(session_id)
+    if last_id == "$":
+        # Pin "$" to a concrete id so nothing published between two XREADs is missed
+        latest = await redis_conn.xrevrange(key, count=1)
+        last_id = latest[0][0] if latest else "0"
+    while True:
+        response = await redis_conn.xread({key: last_id}, count=count, block=block_ms)
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                last_id = entry_id
+                entry = _decode_entry(fields)
+                yield entry_id.decode(), entry
+                if entry.get("event") == END_EVENT:
+                    return
+
+
+class SessionStreamHub:
+    """
+    Serves all of this process's live observers from one blocking XREAD over every
+    watched stream, so they tie up a single pooled Redis connection between them
+    rather than one each. The read loop only runs while someone is watching. A
+    stream that starts being watched during a blocked XREAD is added when it
+    returns, within block_ms. An observer that falls more than `queue_size`
+    entries behind is cut off instead of being buffered for without bound.
+    """
+
+    def __init__(self, redis_conn: redis.Redis, block_ms: int = 2000, count: int = 100, queue_size: int = 1000):
+        self.redis = redis_conn
+        self.block_ms = block_ms
+        self.count = count
+        self.queue_size = queue_size
+        self._cursors = {}  # stream key -> id of the last entry read
+        self._subscribers = {}  # stream key -> observer queues
+        self._task = None
+
+    async def watch(self, session_id: str):
+        """Yield the session's entries published from now on, up to and including the end event."""
+        key = session_stream_key(session_id)
+        if key not in self._cursors:
+            latest = await self.redis.xrevrange(key, count=1)
+            self._cursors.setdefault(key, latest[0][0] if latest else "0")
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(key, set()).add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        try:
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return  # cut off for falling behind
+                yield entry
+                if entry.get("event") == END_EVENT:
+                    return
+        finally:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[key]
+                    self._cursors.pop(key, None)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while self._cursors:
+            try:
+                response = await self.redis.xread(dict(self._cursors), count=self.count, block=self.block_ms)
+            except Exception as e:
+                print(f"❌ Session stream read error: {e}")
+                await asyncio.sleep(1)
+                continue
+            for key, entries in response or []:
+                key = key.decode("utf-8")
+                for entry_id, fields in entries:
+                    if key not in self._cursors:
+                        break  # nobody is watching any more
+                    self._cursors[key] = entry_id
+                    self._dispatch(key, _decode_entry(fields))
+
+    def _dispatch(self, key: str, entry: dict):
+        for queue in list(self._subscribers.get(key, ())):
+            try:
+                queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                self._subscribers[key].discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        if entry.get("event") == END_EVENT:
+            # Every observer stops here; later ones start over from the stream's end
+            self._subscribers.pop(key, None)
+            self._cursors.pop(key, None)
+
+
+def get_session_hub(connection: HTTPConnection) -> SessionStreamHub:
+    return connection.app.state.session_hub
+
+
+# Renew / release only if the lease still holds our token
+_RENEW_LEASE = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LEASE = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class SessionLeaseLost(Exception):
+    pass
+
+
+class SessionLease:
+    """
+    Exclusive, expiring ownership of a session's tracking, so its frames are
+    processed (and its stats aggregated) by exactly one socket across all workers.
+    keep_alive() renews the lease every third of its lifetime and raises
+    SessionLeaseLost if another owner took over after it lapsed.
+    """
+
+    def __init__(self, redis_conn: redis.Redis, session_id: str, lease_ms: int = SESSION_LEASE_MS):
+        self.redis = redis_conn
+        self.key = session_owner_key(session_id)
+        self.lease_ms = lease_ms
+        self.token = f"{WORKER_ID}:{uuid.uuid4().hex[:8]}"
+
+    async def acquire(self) -> bool:
+        return bool(await self.redis.set(self.key, self.token, nx=True, px=self.lease_ms))
+
+    async def keep_alive(self):
+        while True:
+            await asyncio.sleep(self.lease_ms / 3000)
+            if not await self.redis.eval(_RENEW_LEASE, 1, self.key, self.token, self.lease_ms):
+                raise SessionLeaseLost(self.key)
+
+    async def release(self):
+        await self.redis.eval(_RELEASE_LEASE, 1, self.key, self.token)
+
+
+async def wait_for_release(redis_conn: redis.Redis, session_id: str, timeout: float, interval: float = 0.05) -> bool:
+    """
+    Wait until nobody holds the session's lease, i.e. its tracking socket has made
+    its final flush. Returns False if it is still held after `timeout` seconds.
+    """
+    key = session_owner_key(session_id)
+    deadline = time.monotonic() + timeout
+    while await redis_conn.exists(key):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
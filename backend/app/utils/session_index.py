@@ -0,0 +1,14 @@
+from datetime import datetime
+
+# Per-user sorted set of session ids scored by start time (epoch seconds).
+# Lets /sessions page through one user's sessions without scanning session:*.
+
+def session_index_key(user_id: str) -> str:
+    return f"user_sessions:{user_id}"
+
+def start_time_score(start_time: str) -> float:
+    return datetime.fromisoformat(start_time.replace("Z", "+00:00")).timestamp()
+
+def index_session(redis_conn, user_id: str, session_id: str, start_time: str, only_new: bool = False):
+    # Works on a client or a pipeline (await the result on an async client)
+    return redis_conn.zadd(session_index_key(user_id), {session_id: start_time_score(start_time)}, nx=only_new)
@@ -0,0 +1,163 @@
+import json
+
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+
+from backend.app.utils.session_bus import session_owner_key
+
+# Sessions are Redis hashes at session:{id}: user_id, session_duration, start_time,
+# status, end_time, plus the focus counters (focused_ms, frames, ...) that the
+# tracking socket HINCRBYs in. Sessions written before the switch are JSON strings
+# under the same key, with their counters in a separate session_stats:{id} hash;
+# readers fall back to those, and upgrade_legacy_session converts one in place.
+
+FIELD_TYPES = {"session_duration": int}
+
+
+def session_key(session_id: str) -> str:
+    return f"session:{session_id}"
+
+def legacy_stats_key(session_id: str) -> str:
+    return f"session_stats:{session_id}"
+
+def create_session(redis_conn, session_id: str, session_data: dict):
+    """HSET a new session. Works on a client or a pipeline."""
+    return redis_conn.hset(session_key(session_id), mapping=session_data)
+
+def _decode(field: str, value):
+    if value is None:
+        return None
+    value = value.decode("utf-8") if isinstance(value, bytes) else value
+    convert = FIELD_TYPES.get(field)
+    return convert(value) if convert else value
+
+def decode_session_hash(values: dict) -> dict:
+    session = {}
+    for field, value in values.items():
+        field = field.decode("utf-8") if isinstance(field, bytes) else field
+        session[field] = _decode(field, value)
+    return session
+
+def project_fields(fields, values):
+    """Session dict from an HMGET reply, or None if the session doesn't exist."""
+    session = {field: _decode(field, value) for field, value in zip(fields, values)}
+    # Counter-only hashes (frames tracked for an unknown id) don't count as sessions
+    return session if session.get("user_id") is not None else None
+
+def project_legacy(fields, raw_data):
+    if not raw_data:
+        return None
+    session_data = json.loads(raw_data)
+    values = [session_data.get(field) for field in fields]
+    return project_fields(fields, [str(v) if v is not None else None for v in values])
+
+def _with_user_id(fields):
+    return tuple(fields) if "user_id" in fields else ("user_id",) + tuple(fields)
+
+async def read_sessions(redis_conn: redis.Redis, session_ids, fields) -> list:
+    """
+    HMGET `fields` of several sessions in one round trip (plus one more for any
+    legacy JSON sessions). Returns one dict or None per id, in order.
+    """
+    if not session_ids:
+        return []
+    fields = _with_user_id(fields)
+
+    pipe = redis_conn.pipeline(transaction=False)
+    for session_id in session_ids:
+        pipe.hmget(session_key(session_id), fields)
+    replies = await pipe.execute(raise_on_error=False)
+
+    legacy = [i for i, reply in enumerate(replies) if isinstance(reply, ResponseError)]
+    if legacy:
+        raw_sessions = await redis_conn.mget([session_key(session_ids[i]) for i in legacy])
+        for i, raw_data in zip(legacy, raw_sessions):
+            replies[i] = project_legacy(fields, raw_data)
+
+    return [
+        reply if isinstance(reply, dict) or reply is None else project_fields(fields, reply)
+        for reply in replies
+    ]
+
+async def read_session(redis_conn: redis.Redis, session_id: str, fields):
+    return (await read_sessions(redis_conn, [session_id], fields))[0]
+
+
+# Converts a legacy JSON session into a hash in one step, folding in its
+# session_stats counters. Returns 1 if converted, 0 if there was nothing to convert.
+_UPGRADE_LEGACY_SESSION = """
+if redis.call("TYPE", KEYS[1])["ok"] ~= "string" then
+    return 0
+end
+local data = cjson.decode(redis.call("GET", KEYS[1]))
+local stats = redis.call("HGETALL", KEYS[2])
+redis.call("DEL", KEYS[1])
+for field, value in pairs(data) do
+    local kind = type(value)
+    if kind == "number" and value == math.floor(value) then
+        redis.call("HSET", KEYS[1], field, string.format("%d", value))
+    elseif kind == "string" or kind == "number" or kind == "boolean" then
+        redis.call("HSET", KEYS[1], field, tostring(value))
+    elseif kind == "table" then
+        redis.call("HSET", KEYS[1], field, cjson.encode(value))
+    end
+end
+for i = 1, #stats, 2 do
+    redis.call("HINCRBY", KEYS[1], stats[i], stats[i + 1])
+end
+redis.call("DEL", KEYS[2])
+return 1
+"""
+
+def upgrade_legacy_session(redis_conn, session_id: str):
+    """Works on an async or sync client (await the result on an async one)."""
+    return redis_conn.eval(_UPGRADE_LEGACY_SESSION, 2, session_key(session_id), legacy_stats_key(session_id))
+
+
+# Atomic active -> completed transition. Returns {outcome, HGETALL} where outcome is
+# "completed" (this call ended it) or "already_completed", or {"missing"} / {"legacy"},
+# or {"tracked"} while a tracking socket holds the session lease (KEYS[2]).
+_COMPLETE_SESSION = """
+local kind = redis.call("TYPE", KEYS[1])["ok"]
+if kind == "string" then
+    return {"legacy"}
+end
+if kind ~= "hash" or redis.call("HEXISTS", KEYS[1], "user_id") == 0 then
+    return {"missing"}
+end
+local outcome = "already_completed"
+if redis.call("HGET", KEYS[1], "status") == "active" then
+    if redis.call("EXISTS", KEYS[2]) == 1 then
+        return {"tracked"}
+    end
+    redis.call("HSET", KEYS[1], "status", "completed", "end_time", ARGV[1])
+    outcome = "completed"
+end
+return {outcome, redis.call("HGETALL", KEYS[1])}
+"""
+
+class SessionStillTracked(Exception):
+    pass
+
+
+async def complete_session(redis_conn: redis.Redis, session_id: str, end_time: str):
+    """
+    Mark a session completed (once) and return (completed_now, session) with all of
+    its fields and counters, or (False, None) if there is no such session. Raises
+    SessionStillTracked instead of completing a session whose tracking socket is
+    still open, as its last counters haven't been written yet.
+    """
+    keys = (session_key(session_id), session_owner_key(session_id))
+    reply = await redis_conn.eval(_COMPLETE_SESSION, 2, *keys, end_time)
+    if reply[0] == b"legacy":
+        await upgrade_legacy_session(redis_conn, session_id)
+        reply = await redis_conn.eval(_COMPLETE_SESSION, 2, *keys, end_time)
+
+    outcome = reply[0].decode("utf-8")
+    if outcome == "tracked":
+        raise SessionStillTracked(session_id)
+    if outcome not in ("completed", "already_completed"):
+        return False, None
+    flat = reply[1]
+    session = decode_session_hash(dict(zip(flat[::2], flat[1::2])))
+    return outcome == "completed", session
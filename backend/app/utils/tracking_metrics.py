@@ -0,0 +1,88 @@
+import time
+from collections import deque
+
+from backend.app.utils.metrics import Counter, Gauge, Histogram
+
+# Per-frame stage timings for the tracking pipeline. Stages timed in the inference
+# workers (color, face_mesh, face_detector, gaze) travel back with each result and
+# are recorded on the event loop next to the ones timed there (slot_wait, json_parse,
+# base64_decode, imdecode, send, and dedup for frames that reuse the previous result).
+
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+tracking_stage_seconds = Histogram(
+    "tracking_stage_seconds", "Time spent per frame in each tracking pipeline stage",
+    labelnames=("stage",), buckets=STAGE_BUCKETS
+)
+tracking_frame_seconds = Histogram(
+    "tracking_frame_seconds", "Time from taking a frame off the socket to sending its result"
+)
+tracking_frames = Counter("tracking_frames_total", "Frames processed by tracking sockets")
+tracking_active_sockets = Gauge("tracking_active_sockets", "Open tracking WebSockets")
+tracking_inference_reused = Counter(
+    "tracking_inference_reused_total", "Frames answered with the previous result because they barely changed"
+)
+
+
+class StageTimer:
+    """
+    Splits one frame's processing into named stages: each mark() charges the time
+    since the previous mark to that stage, adding up if the same stage is marked
+    twice on one timer. Each inference call times its worker stages on its own
+    timer, so an ROI retry is recorded as a second sample of those stages.
+    """
+    __slots__ = ("times", "_last")
+
+    def __init__(self):
+        self.times = {}
+        self._last = time.perf_counter()
+
+    def restart(self):
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.times[stage] = self.times.get(stage, 0.0) + now - self._last
+        self._last = now
+
+
+class RateMeter:
+    """Events per second over a sliding window, read lazily at scrape time."""
+
+    def __init__(self, window: float = 10.0):
+        self.window = window
+        self._events = deque()
+
+    def _trim(self, now: float):
+        while self._events and self._events[0] <= now - self.window:
+            self._events.popleft()
+
+    def mark(self):
+        now = time.monotonic()
+        self._events.append(now)
+        self._trim(now)
+
+    def rate(self) -> float:
+        self._trim(time.monotonic())
+        return len(self._events) / self.window
+
+
+frame_rate = RateMeter()
+Gauge(
+    "tracking_frames_per_second", "Frames processed per second over the last 10 seconds"
+).set_function(frame_rate.rate)
+
+reuse_rate = RateMeter()
+
+def _skip_ratio() -> float:
+    frames = frame_rate.rate()
+    return reuse_rate.rate() / frames if frames else 0.0
+
+Gauge(
+    "tracking_inference_skip_ratio", "Fraction of frames over the last 10 seconds that skipped inference"
+).set_function(_skip_ratio)
+
+
+def observe_stages(times: dict):
+    for stage, seconds in times.items():
+        tracking_stage_seconds.labels(stage=stage).observe(seconds)
@@ -0,0 +1,17 @@
+from backend.app.utils.ttl_cache import TTLCache
+from backend.config import USER_CACHE_SIZE, USER_CACHE_TTL
+
+# user_id:{id} -> username, so a user can be found from the JWT subject
+# without scanning every user:* record.
+
+def user_id_key(user_id: str) -> str:
+    return f"user_id:{user_id}"
+
+def index_user(redis_conn, user_id: str, username: str):
+    redis_conn.set(user_id_key(user_id), username)
+
+# Decoded user profiles (without the password hash), keyed by user_id
+profile_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+def public_profile(user_data: dict) -> dict:
+    return {key: value for key, value in user_data.items() if key != "password"}
@@ -0,0 +1,73 @@
+"""
+Compare the dual (FaceMesh + FaceDetection) and single-pass face pipelines
+on a fixed set of images.
+
+    python -m backend.benchmarks.face_pipeline --images path/to/frames --repeat 50
+
+The default frames (backend/benchmarks/frames) are four 640x480 webcam-style
+shots of one face (centred, off to the side, tilted, dim), made from the public
+domain portrait of Grace Hopper. Timings only mean something when every mode
+finds the faces: frames without one only exercise the no-face path.
+"""
+import argparse
+import glob
+import os
+import time
+
+import cv2
+
+from backend.app.utils.image_utils import detect_faces_and_gaze
+
+DEFAULT_IMAGES = os.path.join(os.path.dirname(__file__), "frames")
+
+
+def load_images(directory: str):
+    paths = sorted(
+        path for pattern in ("*.jpg", "*.jpeg", "*.png")
+        for path in glob.glob(os.path.join(directory, pattern))
+    )
+    images = [cv2.imread(path, cv2.IMREAD_COLOR) for path in paths]
+    return [(path, image) for path, image in zip(paths, images) if image is not None]
+
+
+def run(mode: str, images, repeat: int):
+    for _, image in images:
+        detect_faces_and_gaze(image, mode=mode)  # warm up the graphs
+
+    faces = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, image in images:
+            if detect_faces_and_gaze(image, mode=mode)["face_box"] is not None:
+                faces += 1
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(images)), faces / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=DEFAULT_IMAGES, help="directory of .jpg/.png frames")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        raise SystemExit(f"No images found in {args.images}")
+
+    print(f"{len(images)} images x {args.repeat} passes")
+    print(f"{'mode':<8} {'ms/frame':>10} {'faces/pass':>11}")
+    results = {}
+    missed = []
+    for mode in ("dual", "single"):
+        per_frame, faces = run(mode, images, args.repeat)
+        results[mode] = per_frame
+        print(f"{mode:<8} {per_frame * 1000:>10.2f} {faces:>11.1f}")
+        if faces < len(images):
+            missed.append(mode)
+    print(f"single-pass speedup: {results['dual'] / results['single']:.2f}x")
+    if missed:
+        print(f"❌ {', '.join(missed)} missed faces in some frames; those frames only time the no-face path")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compare the JSON/base64 and binary tracking frame paths.
+
+    python -m backend.benchmarks.frame_decode --width 1280 --height 720 --frames 500
+"""
+import argparse
+import base64
+import json
+import time
+
+import cv2
+import numpy as np
+
+from backend.app.utils.image_utils import FRAME_HEADER, decode_base64_image_from_json, decode_binary_frame
+
+
+def synthetic_jpeg(width: int, height: int, quality: int) -> bytes:
+    # Smooth gradient plus noise compresses roughly like a webcam frame
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    ys = np.linspace(0, 255, height, dtype=np.float32)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[..., 0] = (xs[None, :] * 0.6 + ys[:, None] * 0.4).astype(np.uint8)
+    image[..., 1] = ys[:, None].astype(np.uint8)
+    image[..., 2] = xs[None, :].astype(np.uint8)
+    noise = np.random.default_rng(0).integers(0, 24, image.shape, dtype=np.uint8)
+    ok, encoded = cv2.imencode(".jpg", cv2.add(image, noise), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("Could not encode synthetic frame")
+    return encoded.tobytes()
+
+
+def time_per_frame(decode, message, frames: int) -> float:
+    decode(message)  # warm up
+    start = time.perf_counter()
+    for _ in range(frames):
+        decode(message)
+    return (time.perf_counter() - start) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    jpeg = synthetic_jpeg(args.width, args.height, args.quality)
+    text_message = json.dumps({
+        "image": "data:image/jpeg;base64," + base64.b64encode(jpeg).decode("ascii"),
+        "timestamp": time.time() * 1000,
+    })
+    binary_message = FRAME_HEADER.pack(0, time.time() * 1000, args.width, args.height) + jpeg
+
+    text_time = time_per_frame(decode_base64_image_from_json, text_message, args.frames)
+    binary_time = time_per_frame(decode_binary_frame, binary_message, args.frames)
+
+    print(f"{args.width}x{args.height} JPEG q={args.quality}, {args.frames} frames")
+    print(f"{'path':<8} {'bytes/frame':>12} {'ms/frame':>10}")
+    print(f"{'json':<8} {len(text_message.encode()):>12} {text_time * 1000:>10.3f}")
+    print(f"{'binary':<8} {len(binary_message):>12} {binary_time * 1000:>10.3f}")
+    print(f"ingress saved: {1 - len(binary_message) / len(text_message.encode()):.1%}, "
+          f"decode time saved: {1 - binary_time / text_time:.1%}")
+
+
+if __name__ == "__main__":
+    main()
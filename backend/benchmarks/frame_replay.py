@@ -0,0 +1,217 @@
+"""
+Replay recorded (or synthetic) frames through the tracking vision pipeline offline
+on CPU: decode_base64_image_from_json followed by detect_faces_and_gaze.
+
+For every resolution it reports per-stage latency (p50/p95/p99) and throughput
+from a single in-process pass, then sweeps worker process counts for end-to-end
+frames/sec. Peak RSS of the benchmark and its workers is included. The JSON
+report (--output) can be diffed between commits.
+
+    python -m backend.benchmarks.frame_replay --frames path/to/frames --resolutions 320x240,640x480 --workers 1,2,4
+    python -m backend.benchmarks.frame_replay --synthetic 30 --output replay.json
+"""
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from backend.app.utils import image_utils
+from backend.app.utils.tracking_metrics import StageTimer
+from backend.benchmarks.face_pipeline import DEFAULT_IMAGES, load_images
+
+STAGES = ("json_parse", "base64_decode", "imdecode", "color", "face_mesh", "face_detector", "gaze", "total")
+
+
+def synthetic_frames(count: int, width: int = 640, height: int = 480, seed: int = 0):
+    # Noise plus a moving bright ellipse: enough texture for realistic JPEG sizes,
+    # but no real face, so this measures the no-face path
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        frame = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+        center = (width // 2 + int(width / 8 * np.sin(i / 5)), height // 2)
+        cv2.ellipse(frame, center, (width // 8, height // 5), 0, 0, 360, (180, 190, 210), -1)
+        frames.append((f"synthetic-{i}", frame))
+    return frames
+
+
+def parse_resolution(value: str):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def encode_messages(frames, resolution, quality: int = 80):
+    # Same wire format the browser used to send: JSON with a JPEG data URL
+    messages = []
+    for _, frame in frames:
+        resized = cv2.resize(frame, resolution, interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            data_url = "data:image/jpeg;base64," + base64.b64encode(jpeg.tobytes()).decode("ascii")
+            messages.append(json.dumps({"image": data_url}))
+    return messages
+
+
+def process_message(message: str, mode: str):
+    """Returns the stage times and whether a face was found."""
+    timer = StageTimer()
+    start = time.perf_counter()
+    image = image_utils.decode_base64_image_from_json(message, timer)
+    found = False
+    if image is not None:
+        found = image_utils.detect_faces_and_gaze(image, mode=mode, timer=timer)["face_box"] is not None
+    timer.times["total"] = time.perf_counter() - start
+    return timer.times, found
+
+
+def _init_worker():
+    image_utils.get_face_mesh()
+    image_utils.get_face_detector()
+
+
+def _process_in_worker(args):
+    message, mode = args
+    return process_message(message, mode)[0]["total"]
+
+
+def summarize(samples):
+    seconds = np.asarray(samples, dtype=np.float64)
+    if not len(seconds):
+        return None
+    return {
+        "count": int(len(seconds)),
+        "mean_ms": float(seconds.mean() * 1000),
+        "p50_ms": float(np.percentile(seconds, 50) * 1000),
+        "p95_ms": float(np.percentile(seconds, 95) * 1000),
+        "p99_ms": float(np.percentile(seconds, 99) * 1000),
+        "per_second": float(1 / seconds.mean()) if seconds.mean() > 0 else None,
+    }
+
+
+def run_stages(messages, mode: str, repeat: int):
+    for message in messages:
+        process_message(message, mode)  # warm up the graphs
+
+    samples = {stage: [] for stage in STAGES}
+    faces = 0
+    for _ in range(repeat):
+        for message in messages:
+            times, found = process_message(message, mode)
+            faces += found
+            for stage, seconds in times.items():
+                samples[stage].append(seconds)
+    return {stage: summarize(values) for stage, values in samples.items() if values}, faces / repeat
+
+
+def run_workers(messages, mode: str, repeat: int, workers: int):
+    jobs = [(message, mode) for message in messages] * repeat
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker,
+    )
+    try:
+        list(executor.map(_process_in_worker, jobs[:workers * 2]))  # start and warm every worker
+        start = time.perf_counter()
+        latencies = list(executor.map(_process_in_worker, jobs, chunksize=max(1, len(jobs) // (workers * 8))))
+        elapsed = time.perf_counter() - start
+    finally:
+        executor.shutdown(wait=True)
+
+    result = summarize(latencies)
+    result["workers"] = workers
+    result["frames_per_second"] = len(jobs) / elapsed
+    return result
+
+
+def peak_rss_mb(who) -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", default=None, help=f"directory of .jpg/.png frames (default: {DEFAULT_IMAGES})")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate this many synthetic frames instead")
+    parser.add_argument("--resolutions", default="320x240,640x480,1280x720")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker process counts")
+    parser.add_argument("--mode", choices=("single", "dual"), default=image_utils.FACE_PIPELINE_MODE)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        frames = synthetic_frames(args.synthetic)
+    else:
+        frames = load_images(args.frames or DEFAULT_IMAGES)
+    if not frames:
+        raise SystemExit("No frames to replay")
+
+    resolutions = [parse_resolution(value) for value in args.resolutions.split(",")]
+    worker_counts = [int(value) for value in args.workers.split(",")]
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {
+            "frames": len(frames), "synthetic": bool(args.synthetic), "mode": args.mode,
+            "repeat": args.repeat, "resolutions": args.resolutions.split(","), "workers": worker_counts,
+        },
+        "resolutions": {},
+    }
+
+    print(f"{len(frames)} frames x {args.repeat} passes, mode={args.mode}")
+    for resolution in resolutions:
+        name = f"{resolution[0]}x{resolution[1]}"
+        messages = encode_messages(frames, resolution)
+        stages, faces = run_stages(messages, args.mode, args.repeat)
+
+        print(f"\n{name}: faces found in {faces:.1f} of {len(messages)} frames per pass")
+        print(f"{'stage':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'per sec':>10}")
+        for stage in STAGES:
+            if stage in stages:
+                s = stages[stage]
+                print(f"{stage:<14} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['per_second']:>10.0f}")
+
+        sweep = []
+        print(f"{'workers':<14} {'fps':>9} {'p50 ms':>9} {'p99 ms':>9}")
+        for workers in worker_counts:
+            result = run_workers(messages, args.mode, args.repeat, workers)
+            sweep.append(result)
+            print(f"{workers:<14} {result['frames_per_second']:>9.1f} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+
+        report["resolutions"][name] = {"stages": stages, "faces_per_pass": faces, "workers": sweep}
+
+    report["peak_rss_mb"] = {
+        "main": peak_rss_mb(resource.RUSAGE_SELF),
+        "workers": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+    print(f"\npeak RSS: main {report['peak_rss_mb']['main']:.0f} MB, workers {report['peak_rss_mb']['workers']:.0f} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Redis latency under concurrent load: the old blocking client called from the
+event loop versus the pooled redis.asyncio client the app now uses.
+Each simulated request does the /me lookup (GET user_id:{id}, GET user:{name}).
+Needs a running Redis; uses keys under the bench: prefix and removes them afterwards.
+
+    python -m backend.benchmarks.redis_load --concurrency 100 --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+import redis
+import redis.asyncio as aioredis
+
+USERS = 100
+
+
+def seed(client: redis.Redis):
+    pipe = client.pipeline()
+    for i in range(USERS):
+        pipe.set(f"bench:user_id:{i}", f"user{i}")
+        pipe.set(f"bench:user:user{i}", json.dumps({"user_id": str(i), "username": f"user{i}"}))
+    pipe.execute()
+
+
+def cleanup(client: redis.Redis):
+    keys = list(client.scan_iter("bench:*"))
+    if keys:
+        client.delete(*keys)
+
+
+async def run_blocking(client: redis.Redis, concurrency: int, total: int):
+    async def request(i):
+        username = client.get(f"bench:user_id:{i % USERS}")
+        client.get(f"bench:user:{username.decode()}")
+
+    return await _drive(request, concurrency, total)
+
+
+async def run_async(client: aioredis.Redis, concurrency: int, total: int):
+    async def request(i):
+        username = await client.get(f"bench:user_id:{i % USERS}")
+        await client.get(f"bench:user:{username.decode()}")
+
+    return await _drive(request, concurrency, total)
+
+
+async def _drive(request, concurrency: int, total: int):
+    # Latency includes time spent waiting for the event loop, as a handler would see it
+    latencies = []
+    queue = iter(range(total))
+
+    async def worker():
+        for i in queue:
+            start = time.perf_counter()
+            await asyncio.sleep(0)
+            await request(i)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def report(name: str, latencies, elapsed: float):
+    ms = np.array(latencies) * 1000
+    print(f"{name:<10} {len(ms) / elapsed:>10.0f} {np.percentile(ms, 50):>9.2f} {np.percentile(ms, 99):>9.2f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--max-connections", type=int, default=50)
+    args = parser.parse_args()
+
+    blocking = redis.Redis(host=args.host, port=args.port)
+    pooled = aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(
+        host=args.host, port=args.port, max_connections=args.max_connections,
+    ))
+    seed(blocking)
+    try:
+        print(f"{args.requests} requests, concurrency {args.concurrency}")
+        print(f"{'client':<10} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+
+        start = time.perf_counter()
+        latencies = await run_blocking(blocking, args.concurrency, args.requests)
+        report("blocking", latencies, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        latencies = await run_async(pooled, args.concurrency, args.requests)
+        report("async", latencies, time.perf_counter() - start)
+    finally:
+        cleanup(blocking)
+        await pooled.aclose(close_connection_pool=True)
+        blocking.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
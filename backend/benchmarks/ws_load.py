@@ -0,0 +1,315 @@
+"""
+End-to-end tracking capacity test: log in through /auth/login, start sessions
+through /session/start and stream binary frames over N concurrent
+/ws/session/{id}/track sockets at a fixed fps. Reports round-trip latency,
+dropped/errored frames and throughput per socket as a table and as JSON.
+
+Against a running backend:
+
+    python -m backend.benchmarks.ws_load --url http://127.0.0.1:8000 --sockets 20 --fps 10 --duration 30
+
+Self-contained on a laptop: --serve starts the backend with uvicorn in a
+subprocess, and --fake-redis points it at an in-process fakeredis server.
+
+    python -m backend.benchmarks.ws_load --serve --fake-redis --sockets 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+
+import cv2
+import numpy as np
+import websockets
+
+from backend.app.utils.image_utils import FRAME_HEADER
+
+DEFAULT_IMAGE = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "demo.jpg")
+
+
+def post_json(url: str, body: dict, cookie: str = None):
+    # Setup calls only (one login per run, one start per socket), so plain urllib in a thread is enough
+    request = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"), method="POST")
+    request.add_header("Content-Type", "application/json")
+    if cookie:
+        request.add_header("Cookie", f"access_token={cookie}")
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.loads(response.read() or b"null"), response.headers
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"null"), e.headers
+
+
+def access_token(headers) -> str:
+    cookie = SimpleCookie()
+    for header in headers.get_all("Set-Cookie") or []:
+        cookie.load(header)
+    if "access_token" not in cookie:
+        raise SystemExit("❌ Login response did not set an access_token cookie")
+    return cookie["access_token"].value
+
+
+async def login(base_url: str, username: str, password: str) -> str:
+    status, body, headers = await asyncio.to_thread(
+        post_json, f"{base_url}/auth/login", {"username": username, "password": password}
+    )
+    if status == 404:
+        # First run against a fresh Redis: create the load-test user
+        status, body, headers = await asyncio.to_thread(post_json, f"{base_url}/auth/register", {
+            "username": username, "password": password, "email": f"{username}@example.com",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+    if status not in (200, 201):
+        raise SystemExit(f"❌ Login failed ({status}): {body}")
+    return access_token(headers)
+
+
+async def start_session(base_url: str, token: str, duration: int) -> str:
+    status, body, _ = await asyncio.to_thread(
+        post_json, f"{base_url}/session/start", {"session_duration": duration}, token
+    )
+    if status != 201:
+        raise RuntimeError(f"/session/start failed ({status}): {body}")
+    return body["session_id"]
+
+
+def load_frame(path: str, width: int, height: int, quality: int) -> bytes:
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise SystemExit(f"❌ Could not read {path}")
+    image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+class SocketStats:
+    __slots__ = ("session_id", "sent", "results", "errors", "skipped", "controls", "rtts", "started", "elapsed", "failure")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.sent = 0
+        self.results = 0
+        self.errors = 0
+        self.skipped = 0
+        self.controls = 0
+        self.rtts = []
+        self.started = None
+        self.elapsed = 0.0
+        self.failure = None
+
+    @property
+    def dropped(self) -> int:
+        # Frames that never got a result: replaced in the server's latest-frame slot or lost in flight
+        return max(0, self.sent - self.results - self.errors)
+
+    def summary(self) -> dict:
+        rtts = np.asarray(self.rtts) if self.rtts else np.zeros(1)
+        return {
+            "session_id": self.session_id,
+            "sent": self.sent,
+            "results": self.results,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "server_skipped": self.skipped,
+            "controls": self.controls,
+            "results_per_second": self.results / self.elapsed if self.elapsed else 0.0,
+            "rtt_p50_ms": float(np.percentile(rtts, 50)),
+            "rtt_p95_ms": float(np.percentile(rtts, 95)),
+            "rtt_p99_ms": float(np.percentile(rtts, 99)),
+            "failure": self.failure,
+        }
+
+
+async def run_socket(ws_url: str, stats: SocketStats, frame: bytes, width: int, height: int,
+                     fps: float, duration: float, adaptive: bool):
+    interval = [1.0 / fps]
+
+    async def receive(ws):
+        async for message in ws:
+            data = json.loads(message)
+            if "control" in data:
+                stats.controls += 1
+                if adaptive:
+                    interval[0] = 1.0 / data["control"]["fps"]
+                continue
+            stats.skipped += data.get("skipped", 0)
+            if "error" in data:
+                stats.errors += 1
+            elif "timestamp" in data:
+                stats.results += 1
+                stats.rtts.append(time.time() * 1000 - data["timestamp"])
+
+    try:
+        async with websockets.connect(ws_url, max_size=None) as ws:
+            receiver = asyncio.create_task(receive(ws))
+            stats.started = time.perf_counter()
+            deadline = stats.started + duration
+            next_send = stats.started
+            while time.perf_counter() < deadline:
+                await ws.send(FRAME_HEADER.pack(stats.sent, time.time() * 1000, width, height) + frame)
+                stats.sent += 1
+                next_send += interval[0]
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+            # Give in-flight frames a moment to come back before closing
+            await asyncio.sleep(min(1.0, 5 * interval[0]))
+            stats.elapsed = time.perf_counter() - stats.started
+            receiver.cancel()
+            await asyncio.gather(receiver, return_exceptions=True)
+    except Exception as e:
+        stats.failure = f"{type(e).__name__}: {e}"
+        if stats.started is not None:
+            stats.elapsed = time.perf_counter() - stats.started
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_redis():
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        raise SystemExit("❌ --fake-redis needs the fakeredis package (pip install fakeredis)")
+    port = free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, port
+
+
+def start_backend(port: int, redis_port: int = None):
+    env = dict(os.environ)
+    if redis_port is not None:
+        env.update(REDIS_HOST="127.0.0.1", REDIS_PORT=str(redis_port), REDIS_DB="0")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def wait_for_backend(base_url: str, process, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("❌ Backend exited during startup")
+        try:
+            await asyncio.to_thread(urllib.request.urlopen, f"{base_url}/metrics", None, 2)
+            return
+        except OSError:
+            await asyncio.sleep(0.5)
+    raise SystemExit("❌ Backend did not come up in time")
+
+
+def print_table(results):
+    print(f"{'session':<10} {'sent':>6} {'results':>8} {'dropped':>8} {'errors':>7} {'res/s':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['session_id'][:8]:<10} {r['sent']:>6} {r['results']:>8} {r['dropped']:>8} {r['errors']:>7} "
+              f"{r['results_per_second']:>7.1f} {r['rtt_p50_ms']:>8.1f} {r['rtt_p95_ms']:>8.1f} {r['rtt_p99_ms']:>8.1f}"
+              + (f"  {r['failure']}" if r["failure"] else ""))
+
+
+async def run(args, base_url: str):
+    frame = load_frame(args.image, args.width, args.height, args.quality)
+    token = await login(base_url, args.username, args.password)
+    session_ids = await asyncio.gather(*(start_session(base_url, token, args.session_minutes) for _ in range(args.sockets)))
+
+    ws_base = base_url.replace("http", "ws", 1)
+    stats = [SocketStats(session_id) for session_id in session_ids]
+    print(f"📡 {args.sockets} sockets x {args.fps} fps for {args.duration}s ({len(frame) / 1024:.1f} KB frames)")
+
+    async def ramped(i, s):
+        await asyncio.sleep(i * args.ramp / max(1, args.sockets))
+        await run_socket(f"{ws_base}/ws/session/{s.session_id}/track", s, frame, args.width, args.height,
+                         args.fps, args.duration, args.adaptive)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ramped(i, s) for i, s in enumerate(stats)))
+    elapsed = time.perf_counter() - start
+
+    results = [s.summary() for s in stats]
+    all_rtts = np.concatenate([np.asarray(s.rtts) for s in stats if s.rtts]) if any(s.rtts for s in stats) else np.zeros(1)
+    total = {
+        "sockets": args.sockets,
+        "failed_sockets": sum(1 for r in results if r["failure"]),
+        "sent": sum(r["sent"] for r in results),
+        "results": sum(r["results"] for r in results),
+        "dropped": sum(r["dropped"] for r in results),
+        "errors": sum(r["errors"] for r in results),
+        "results_per_second": sum(r["results"] for r in results) / elapsed,
+        "rtt_p50_ms": float(np.percentile(all_rtts, 50)),
+        "rtt_p95_ms": float(np.percentile(all_rtts, 95)),
+        "rtt_p99_ms": float(np.percentile(all_rtts, 99)),
+    }
+    return {"config": {k: v for k, v in vars(args).items() if k != "password"}, "total": total, "sockets": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="backend to test (ignored with --serve)")
+    parser.add_argument("--serve", action="store_true", help="start the backend in a subprocess")
+    parser.add_argument("--fake-redis", action="store_true", help="with --serve, use an in-process fakeredis server")
+    parser.add_argument("--sockets", type=int, default=10)
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=20, help="seconds of streaming per socket")
+    parser.add_argument("--ramp", type=float, default=2, help="seconds over which sockets are opened")
+    parser.add_argument("--adaptive", action="store_true", help="follow the server's rate control messages")
+    parser.add_argument("--image", default=DEFAULT_IMAGE)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--username", default="loadtest")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--session-minutes", type=int, default=60)
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    backend = None
+    fake_redis = None
+    base_url = args.url.rstrip("/")
+    try:
+        if args.serve:
+            redis_port = None
+            if args.fake_redis:
+                fake_redis, redis_port = start_fake_redis()
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            backend = start_backend(port, redis_port)
+            asyncio.run(wait_for_backend(base_url, backend))
+        elif args.fake_redis:
+            raise SystemExit("❌ --fake-redis only applies together with --serve")
+
+        report = asyncio.run(run(args, base_url))
+    finally:
+        if backend is not None:
+            backend.terminate()
+            backend.wait(timeout=30)
+        if fake_redis is not None:
+            fake_redis.shutdown()
+
+    print_table(report["sockets"])
+    t = report["total"]
+    print(f"\ntotal: {t['results']}/{t['sent']} frames answered, {t['dropped']} dropped, {t['errors']} errors, "
+          f"{t['failed_sockets']} failed sockets, {t['results_per_second']:.1f} results/s, "
+          f"RTT p50 {t['rtt_p50_ms']:.1f} / p95 {t['rtt_p95_ms']:.1f} / p99 {t['rtt_p99_ms']:.1f} ms")
+    print(json.dumps(report["total"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# Inference engine (MediaPipe worker pool)
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", os.cpu_count() or 1))
+# Micro-batching: when frames outnumber workers, each worker takes its share of the queue,
+# up to INFERENCE_MAX_BATCH_SIZE frames (run one after another). Once every worker is busy the
+# scheduler waits at most INFERENCE_MAX_WAIT_MS for more frames before dispatching
+INFERENCE_MAX_BATCH_SIZE = int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", 8))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", 5))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", INFERENCE_WORKERS * INFERENCE_MAX_BATCH_SIZE * 2))
+
+# Face pipeline: "single" derives the face box from FaceMesh landmarks,
+# "dual" also runs FaceDetection on every frame
+FACE_PIPELINE_MODE = os.environ.get("FACE_PIPELINE_MODE", "single")
+FACE_DETECTION_INTERVAL = int(os.environ.get("FACE_DETECTION_INTERVAL", 0))
+
+# Region-of-interest tracking: full frames are downscaled to at most
+# INFERENCE_TARGET_WIDTH, face crops (last box padded by ROI_PADDING of its
+# size on every side) to at most ROI_TARGET_SIZE on their longer side
+INFERENCE_TARGET_WIDTH = int(os.environ.get("INFERENCE_TARGET_WIDTH", 640))
+ROI_TARGET_SIZE = int(os.environ.get("ROI_TARGET_SIZE", 320))
+ROI_PADDING = float(os.environ.get("ROI_PADDING", 0.5))
+
+# In-process cache of decoded user profiles (/me)
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 1024))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60))
+# Verified JWT claims, keyed by token hash and kept until the token's exp
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", 4096))
+
+# Redis connection pool
+REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
+REDIS_DB = int(os.environ.get("REDIS_DB", 0))
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 50))
+REDIS_POOL_TIMEOUT = float(os.environ.get("REDIS_POOL_TIMEOUT", 5))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get("REDIS_SOCKET_CONNECT_TIMEOUT", 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get("REDIS_HEALTH_CHECK_INTERVAL", 30))
+
+# Password hashing (bcrypt runs on its own bounded thread pool)
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", 2))
+HASH_QUEUE_SIZE = int(os.environ.get("HASH_QUEUE_SIZE", 32))
+
+# Focus/distraction classification of gaze results
+FOCUS_MAX_HORIZONTAL = float(os.environ.get("FOCUS_MAX_HORIZONTAL", 0.2))
+FOCUS_MIN_VERTICAL = float(os.environ.get("FOCUS_MIN_VERTICAL", 0.15))
+FOCUS_MAX_VERTICAL = float(os.environ.get("FOCUS_MAX_VERTICAL", 0.85))
+FOCUS_MAX_FRAME_GAP = float(os.environ.get("FOCUS_MAX_FRAME_GAP", 2.0))
+
+# Near-duplicate frames reuse the previous result instead of running inference. Frames are
+# compared as grayscale thumbnails DEDUP_THUMBNAIL_WIDTH cells wide; if no cell moved by more
+# than DEDUP_THRESHOLD gray levels the result is reused, for at most DEDUP_MAX_AGE seconds
+# before inference runs again. DEDUP_THRESHOLD=0 disables this.
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", 8))
+DEDUP_MAX_AGE = float(os.environ.get("DEDUP_MAX_AGE", 1.0))
+DEDUP_THUMBNAIL_WIDTH = int(os.environ.get("DEDUP_THUMBNAIL_WIDTH", 64))
+
+# Blink detection from eye openness (lid gap / eye length). Eyes count as closed below
+# BLINK_CLOSE_RATIO of the session's recent open-eye baseline and open again above BLINK_OPEN_RATIO
+BLINK_CLOSE_RATIO = float(os.environ.get("BLINK_CLOSE_RATIO", 0.6))
+BLINK_OPEN_RATIO = float(os.environ.get("BLINK_OPEN_RATIO", 0.8))
+BLINK_BASELINE_FRAMES = int(os.environ.get("BLINK_BASELINE_FRAMES", 64))
+# Closures longer than this are eyes shut, not blinks
+BLINK_MAX_DURATION = float(os.environ.get("BLINK_MAX_DURATION", 1.0))
+# Window of the rolling blinks-per-minute value
+BLINK_WINDOW = float(os.environ.get("BLINK_WINDOW", 60.0))
+# Frames further apart than this can miss a whole blink (~100-150 ms), so that time
+# isn't counted and no rate is reported while the client sends this slowly (e.g. idle)
+BLINK_MAX_FRAME_GAP = float(os.environ.get("BLINK_MAX_FRAME_GAP", 0.2))
+
+# How often a tracking socket writes its buffered counters and gaze points to Redis
+TRACKING_FLUSH_INTERVAL = float(os.environ.get("TRACKING_FLUSH_INTERVAL", 2.0))
+# Gaze points buffered per socket before a flush is forced
+GAZE_BUFFER_RECORDS = int(os.environ.get("GAZE_BUFFER_RECORDS", 256))
+
+# Gaze heatmaps (/session/{id}/heatmap)
+# Horizontal ratios within +/- this range map onto the screen (matches the frontend's sensitivity of 5)
+HEATMAP_HORIZONTAL_RANGE = float(os.environ.get("HEATMAP_HORIZONTAL_RANGE", 0.2))
+HEATMAP_CACHE_MAX_ENTRIES = int(os.environ.get("HEATMAP_CACHE_MAX_ENTRIES", 1000))
+HEATMAP_CACHE_TTL = int(os.environ.get("HEATMAP_CACHE_TTL", 7 * 24 * 3600))
+
+# Server-driven client rate control on the tracking socket
+RATE_MAX_FPS = int(os.environ.get("RATE_MAX_FPS", 10))
+RATE_MIN_FPS = int(os.environ.get("RATE_MIN_FPS", 1))
+RATE_IDLE_FPS = int(os.environ.get("RATE_IDLE_FPS", 2))
+# Gaze within RATE_STABLE_DELTA of the previous result for RATE_IDLE_AFTER seconds drops to RATE_IDLE_FPS
+RATE_IDLE_AFTER = float(os.environ.get("RATE_IDLE_AFTER", 10))
+RATE_STABLE_DELTA = float(os.environ.get("RATE_STABLE_DELTA", 0.05))
+# Eye openness changing by more than this (a blink starting) also counts as activity
+RATE_OPENNESS_DELTA = float(os.environ.get("RATE_OPENNESS_DELTA", 0.05))
+RATE_CONTROL_INTERVAL = float(os.environ.get("RATE_CONTROL_INTERVAL", 1.0))
+
+# Outgoing email: "smtp" or "memory" (keeps messages in-process, for tests)
+EMAIL_TRANSPORT = os.environ.get("EMAIL_TRANSPORT", "smtp")
+SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", 465))
+SMTP_SSL = os.environ.get("SMTP_SSL", "1") not in ("0", "false", "False")
+SMTP_TIMEOUT = float(os.environ.get("SMTP_TIMEOUT", 30))
+# Background delivery: up to EMAIL_BATCH_SIZE jobs per send, failed jobs retried after
+# EMAIL_RETRY_BASE * 2**attempt seconds, given up after EMAIL_MAX_ATTEMPTS
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", 20))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", 5))
+EMAIL_RETRY_BASE = float(os.environ.get("EMAIL_RETRY_BASE", 2.0))
+# Close the SMTP connection after this many idle seconds
+EMAIL_IDLE_TIMEOUT = float(os.environ.get("EMAIL_IDLE_TIMEOUT", 60))
+# A worker without a heartbeat for this long is presumed dead and its claimed jobs are requeued
+EMAIL_WORKER_TIMEOUT = float(os.environ.get("EMAIL_WORKER_TIMEOUT", 300))
+# Newest dead-letter jobs kept for inspection
+EMAIL_DEAD_MAX = int(os.environ.get("EMAIL_DEAD_MAX", 1000))
+# Lifetime of password reset tokens, in seconds
+RESET_TOKEN_TTL = int(os.environ.get("RESET_TOKEN_TTL", 3600))
+
+# Session bus: per-frame gaze results go to the session_stream:{id} Redis stream every
+# BUS_PUBLISH_INTERVAL seconds (capped at ~BUS_STREAM_MAXLEN entries, expiring after
+# BUS_STREAM_TTL), and each tracked session is owned through a SESSION_LEASE_MS lease
+BUS_PUBLISH_INTERVAL = float(os.environ.get("BUS_PUBLISH_INTERVAL", 0.2))
+BUS_STREAM_MAXLEN = int(os.environ.get("BUS_STREAM_MAXLEN", 2000))
+BUS_STREAM_TTL = int(os.environ.get("BUS_STREAM_TTL", 24 * 60 * 60))
+SESSION_LEASE_MS = int(os.environ.get("SESSION_LEASE_MS", 10000))
+# /session/end waits up to this many seconds for a session's tracking socket to close
+# and write its last counters before ending it
+SESSION_END_WAIT = float(os.environ.get("SESSION_END_WAIT", 5.0))
+
+# Archive: sessions completed more than ARCHIVE_AFTER seconds ago are moved out of Redis
+# into a compressed SQLite file, ARCHIVE_BATCH_SIZE at a time every ARCHIVE_INTERVAL
+# seconds. Archived sessions that are read again are promoted back into Redis for
+# ARCHIVE_PROMOTE_TTL seconds.
+ARCHIVE_PATH = os.environ.get("ARCHIVE_PATH", "session_archive.sqlite3")
+ARCHIVE_AFTER = float(os.environ.get("ARCHIVE_AFTER", 7 * 24 * 3600))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", 100))
+ARCHIVE_INTERVAL = float(os.environ.get("ARCHIVE_INTERVAL", 300))
+ARCHIVE_PROMOTE_TTL = int(os.environ.get("ARCHIVE_PROMOTE_TTL", 3600))
+# Active sessions nobody ended are completed by the archiver this many seconds after
+# their planned end (start_time + session_duration)
+SESSION_EXPIRE_GRACE = float(os.environ.get("SESSION_EXPIRE_GRACE", 3600))
+# With several hosts, one owns the archive file and runs the archiver; the others set
+# ARCHIVE_URL to its base URL and read archived sessions from it. ARCHIVE_SECRET
+# authenticates those requests (the /internal/archive endpoints are off without it).
+ARCHIVE_URL = os.environ.get("ARCHIVE_URL", "")
+ARCHIVE_SECRET = os.environ.get("ARCHIVE_SECRET", "")
+ARCHIVE_TIMEOUT = float(os.environ.get("ARCHIVE_TIMEOUT", 5))
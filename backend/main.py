@@ -1,15 +1,39 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-import redis
-from backend.app.api import session, tracking, user, auth
+from backend.app.api import session, tracking, user, auth, metrics, archive
+from backend.app.utils.inference_engine import InferenceEngine
+from backend.app.utils.redis_utils import create_redis_client
+from backend.app.utils.jwt_utils import validate_jwt_settings
+from backend.app.utils.email_queue import EmailWorker
+from backend.app.utils.mailer import create_transport
+from backend.app.utils.session_archive import SessionArchive, SessionArchiver, create_session_archive
+from backend.app.utils.session_bus import SessionStreamHub
 from fastapi.middleware.cors import CORSMiddleware
 
 # Define a lifespan context for FastAPI
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.redis = redis.Redis(host='localhost', port=6379, db=0)
+    validate_jwt_settings()
+    app.state.redis = create_redis_client()
+    app.state.inference_engine = InferenceEngine()
+    app.state.inference_engine.start()
+    app.state.email_worker = EmailWorker(app.state.redis, create_transport())
+    app.state.email_worker.start()
+    app.state.session_hub = SessionStreamHub(app.state.redis)
+    app.state.session_archive = create_session_archive()
+    app.state.session_archiver = None
+    if isinstance(app.state.session_archive, SessionArchive):
+        # Only the host that owns the archive file moves sessions into it
+        app.state.session_archiver = SessionArchiver(app.state.redis, app.state.session_archive)
+        app.state.session_archiver.start()
     yield
-    app.state.redis.close()  # Close connection on shutdown
+    if app.state.session_archiver is not None:
+        await app.state.session_archiver.stop()
+    await app.state.session_archive.close()
+    await app.state.session_hub.stop()
+    await app.state.email_worker.stop()
+    app.state.inference_engine.shutdown()
+    await app.state.redis.aclose(close_connection_pool=True)  # Close the pool on shutdown
 
 app = FastAPI(lifespan=lifespan)
 
@@ -26,4 +50,6 @@ app.include_router(session.router)
 app.include_router(tracking.router)
 app.include_router(user.router)
 app.include_router(auth.router)
+app.include_router(metrics.router)
+app.include_router(archive.router)
 
@@ -0,0 +1,79 @@
+"""
+One-time migration: queue sessions that were completed before the archiver existed
+(the sessions_completed sorted set, scored by end time) so they get archived too,
+and schedule sessions still marked active (the sessions_active sorted set) so the
+archiver completes the ones nobody ended. Run migrate_sessions_to_hashes first; only
+hash sessions are queued. Promoted copies of archived sessions (which carry a TTL)
+are skipped. Safe to re-run.
+
+    python -m backend.scripts.backfill_completed_sessions --host localhost --port 6379
+"""
+import argparse
+
+import redis
+
+from backend.app.utils.session_archive import COMPLETED_SESSIONS_KEY, mark_active
+from backend.app.utils.session_index import start_time_score
+
+FIELDS = ("status", "end_time", "start_time", "session_duration")
+
+
+def backfill(redis_conn: redis.Redis, batch_size: int = 500):
+    """Returns the number of (completed, active) sessions queued."""
+    queued = [0, 0]
+    batch = []
+
+    def flush():
+        pipe = redis_conn.pipeline(transaction=False)
+        for key in batch:
+            pipe.hmget(key, FIELDS)
+            pipe.ttl(key)
+        replies = pipe.execute()
+
+        completed = {}
+        active = redis_conn.pipeline(transaction=False)
+        for i, key in enumerate(batch):
+            (status, end_time, start_time, duration), ttl = replies[2 * i], replies[2 * i + 1]
+            session_id = key.decode("utf-8").split("session:", 1)[-1]
+            if status == b"active" and start_time is not None and duration is not None:
+                mark_active(active, session_id, start_time.decode("utf-8"), duration)
+                continue
+            if status != b"completed" or ttl != -1:
+                continue
+            # Sessions ended before end_time was recorded fall back to their start
+            ended = (end_time or start_time)
+            if ended is None:
+                continue
+            completed[session_id] = start_time_score(ended.decode("utf-8"))
+
+        if completed:
+            queued[0] += redis_conn.zadd(COMPLETED_SESSIONS_KEY, completed, nx=True)
+        if len(active):
+            queued[1] += sum(active.execute())
+        batch.clear()
+
+    for key in redis_conn.scan_iter("session:*", count=batch_size, _type="hash"):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return tuple(queued)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    redis_conn = redis.Redis(host=args.host, port=args.port, db=args.db)
+    completed, active = backfill(redis_conn, args.batch_size)
+    print(f"✅ Queued {completed} completed sessions for archiving")
+    print(f"✅ Scheduled {active} active sessions to be completed if nobody ends them")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+One-time migration: build the per-user session index (user_sessions:{user_id})
+from the existing session:* keys. Safe to re-run; already indexed sessions keep their score.
+
+    python -m backend.scripts.backfill_session_index --host localhost --port 6379
+"""
+import argparse
+
+import redis
+from redis.exceptions import ResponseError
+
+from backend.app.utils.session_index import index_session
+from backend.app.utils.session_store import project_fields, project_legacy
+
+FIELDS = ("user_id", "start_time")
+
+
+def backfill(redis_conn: redis.Redis, batch_size: int = 500) -> int:
+    indexed = 0
+    batch = []
+
+    def flush():
+        nonlocal indexed
+        # Sessions are hashes; legacy JSON ones answer HMGET with WRONGTYPE
+        pipe = redis_conn.pipeline(transaction=False)
+        for key in batch:
+            pipe.hmget(key, FIELDS)
+        replies = pipe.execute(raise_on_error=False)
+
+        pipe = redis_conn.pipeline(transaction=False)
+        for key, reply in zip(batch, replies):
+            if isinstance(reply, ResponseError):
+                session_data = project_legacy(FIELDS, redis_conn.get(key))
+            else:
+                session_data = project_fields(FIELDS, reply)
+            if not session_data or not session_data.get("start_time"):
+                continue
+            session_id = key.decode("utf-8").split("session:", 1)[-1]
+            index_session(pipe, session_data["user_id"], session_id, session_data["start_time"], only_new=True)
+            indexed += 1
+        pipe.execute()
+        batch.clear()
+
+    for key in redis_conn.scan_iter("session:*", count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return indexed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    redis_conn = redis.Redis(host=args.host, port=args.port, db=args.db)
+    indexed = backfill(redis_conn, args.batch_size)
+    print(f"✅ Indexed {indexed} sessions")
+
+
+if __name__ == "__main__":
+    main()
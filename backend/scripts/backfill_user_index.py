@@ -0,0 +1,57 @@
+"""
+One-time migration: build the user_id:{id} -> username index from the
+existing user:* records so /me can look users up directly. Safe to re-run.
+
+    python -m backend.scripts.backfill_user_index --host localhost --port 6379
+"""
+import argparse
+import json
+
+import redis
+
+from backend.app.utils.user_index import index_user
+
+
+def backfill(redis_conn: redis.Redis, batch_size: int = 500) -> int:
+    indexed = 0
+    batch = []
+
+    def flush():
+        nonlocal indexed
+        raw_users = redis_conn.mget(batch)
+        pipe = redis_conn.pipeline(transaction=False)
+        for raw_data in raw_users:
+            if not raw_data:
+                continue
+            user_data = json.loads(raw_data.decode("utf-8"))
+            if not user_data.get("user_id") or not user_data.get("username"):
+                continue
+            index_user(pipe, user_data["user_id"], user_data["username"])
+            indexed += 1
+        pipe.execute()
+        batch.clear()
+
+    for key in redis_conn.scan_iter("user:*", count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return indexed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    redis_conn = redis.Redis(host=args.host, port=args.port, db=args.db)
+    indexed = backfill(redis_conn, args.batch_size)
+    print(f"✅ Indexed {indexed} users")
+
+
+if __name__ == "__main__":
+    main()
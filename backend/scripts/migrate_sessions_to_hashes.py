@@ -0,0 +1,50 @@
+"""
+One-time migration: convert legacy JSON session:{id} strings into session hashes,
+folding each session's session_stats:{id} counters into the hash. Each session is
+converted atomically; safe to re-run (already converted sessions are skipped).
+
+    python -m backend.scripts.migrate_sessions_to_hashes --host localhost --port 6379
+"""
+import argparse
+
+import redis
+
+from backend.app.utils.session_store import upgrade_legacy_session
+
+
+def migrate(redis_conn: redis.Redis, batch_size: int = 500) -> int:
+    migrated = 0
+    batch = []
+
+    def flush():
+        nonlocal migrated
+        pipe = redis_conn.pipeline(transaction=False)
+        for key in batch:
+            upgrade_legacy_session(pipe, key.decode("utf-8").split("session:", 1)[-1])
+        migrated += sum(pipe.execute())
+        batch.clear()
+
+    for key in redis_conn.scan_iter("session:*", count=batch_size, _type="string"):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    redis_conn = redis.Redis(host=args.host, port=args.port, db=args.db)
+    migrated = migrate(redis_conn, args.batch_size)
+    print(f"✅ Migrated {migrated} sessions")
+
+
+if __name__ == "__main__":
+    main()
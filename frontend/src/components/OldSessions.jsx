@@ -82,6 +82,14 @@ export default function OldSessions() {
                     {session.status}
                   </span>
                 </p>
+                {session.status === "completed" && (
+                  <img
+                    className="sessionHeatmap"
+                    src={`${BASE_URL}/session/${session.session_id}/heatmap`}
+                    alt="Gaze heatmap"
+                    loading="lazy"
+                  />
+                )}
                 {session.status === "active" && (
                   <button
                     className="resumeButton"
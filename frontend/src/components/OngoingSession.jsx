@@ -6,6 +6,9 @@ import HomeButton from "./HomeButton";
 import LogoutButton  from "./LogoutButton";
 
 const BASE_URL = "http://127.0.0.1:8000";
+const FRAME_HEADER_SIZE = 16;
+// Starting capture settings; the server adjusts them with {"control": ...} messages
+const DEFAULT_CONTROL = { fps: 10, width: 640, quality: 0.8 };
 
 export default function OngoingSession() {
   const { sessionId } = useParams();
@@ -21,6 +24,8 @@ export default function OngoingSession() {
   const socketRef = useRef(null);
   const [detectedFace, setDetectedFace] = useState();
   const [gazePoint, setGazePoint] = useState();
+  const controlRef = useRef(DEFAULT_CONTROL);
+  const frameWidthRef = useRef(null); // Width of the frames sent, to map face boxes back onto the video
   
 
   const formatTime = (seconds) => {
@@ -66,6 +71,10 @@ export default function OngoingSession() {
       socket.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data);
+          if (data.control) {
+            controlRef.current = { ...controlRef.current, ...data.control };
+            return;
+          }
           setDetectedFace(data.face);
           setGazePoint(data.gaze);
           
@@ -89,35 +98,51 @@ export default function OngoingSession() {
     const ctx = canvas.getContext("2d");
 
     const updateCanvasSize = () => {
-      canvas.width = video.videoWidth || 640;
-      canvas.height = video.videoHeight || 480;
+      const videoWidth = video.videoWidth || 640;
+      const videoHeight = video.videoHeight || 480;
+      const scale = Math.min(1, controlRef.current.width / videoWidth);
+      canvas.width = Math.round(videoWidth * scale);
+      canvas.height = Math.round(videoHeight * scale);
     };
 
     video.addEventListener("loadedmetadata", updateCanvasSize);
 
-    const interval = setInterval(() => {
+    let seq = 0;
+    let timer = null;
+
+    const sendFrame = () => {
+      // Re-armed after every frame so fps changes from the server apply immediately
+      timer = setTimeout(sendFrame, 1000 / controlRef.current.fps);
       try {
         if (!video.videoWidth || !video.videoHeight) return;
 
         updateCanvasSize();
+        frameWidthRef.current = canvas.width;
         ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
-        const dataUrl = canvas.toDataURL("image/jpeg", 0.8);
-
-        if (socketRef.current.readyState === WebSocket.OPEN) {
-          socketRef.current.send(
-            JSON.stringify({
-              image: dataUrl,
-              timestamp: Date.now(),
-            })
-          );
-        }
+
+        // Binary frame: 16-byte little-endian header (seq, capture time, width, height) + raw JPEG
+        canvas.toBlob(async (blob) => {
+          if (!blob || socketRef.current?.readyState !== WebSocket.OPEN) return;
+
+          const jpeg = new Uint8Array(await blob.arrayBuffer());
+          const frame = new Uint8Array(FRAME_HEADER_SIZE + jpeg.byteLength);
+          const header = new DataView(frame.buffer);
+          header.setUint32(0, seq++, true);
+          header.setFloat64(4, Date.now(), true);
+          header.setUint16(12, canvas.width, true);
+          header.setUint16(14, canvas.height, true);
+          frame.set(jpeg, FRAME_HEADER_SIZE);
+
+          socketRef.current.send(frame.buffer);
+        }, "image/jpeg", controlRef.current.quality);
       } catch (err) {
         console.error("📸 Frame capture/send failed:", err);
       }
-    }, 100);
+    };
+    sendFrame();
 
     return () => {
-      clearInterval(interval);
+      clearTimeout(timer);
       video.removeEventListener("loadedmetadata", updateCanvasSize);
     };
   }, [stream, sessionEnded]);
@@ -134,10 +159,13 @@ export default function OngoingSession() {
     const ctx = canvas.getContext("2d");
     ctx.clearRect(0, 0, canvas.width, canvas.height);
 
+    // Face boxes are in the coordinates of the (possibly downscaled) frame that was sent
+    const scale = frameWidthRef.current ? video.videoWidth / frameWidthRef.current : 1;
+
     ctx.beginPath();
     ctx.strokeStyle = "lime";
     ctx.lineWidth = 2;
-    ctx.rect(detectedFace.x, detectedFace.y, detectedFace.w, detectedFace.h);
+    ctx.rect(detectedFace.x * scale, detectedFace.y * scale, detectedFace.w * scale, detectedFace.h * scale);
     ctx.stroke();
 
      
@@ -183,8 +211,18 @@ export default function OngoingSession() {
     setTimeLeft(diffInSeconds > 0 ? diffInSeconds : 0);
   }, [sessionInfo]);
 
+  // Resolves once the tracking socket is closed; the server then writes its last counters
+  const closeSocket = () => new Promise((resolve) => {
+    const socket = socketRef.current;
+    if (!socket || socket.readyState === WebSocket.CLOSED) return resolve();
+    socket.addEventListener("close", () => resolve(), { once: true });
+    socket.close();
+  });
+
   const endSession = useCallback(async () => {
     try {
+      // Close tracking first so the report includes every frame sent
+      await closeSocket();
       const response = await fetch(`${BASE_URL}/session/end`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
@@ -193,7 +231,6 @@ export default function OngoingSession() {
 
       if (!response.ok) throw new Error(`Session failed: ${response.status}`);
 
-      if (socketRef.current) socketRef.current.close();
       setSessionEnded(true);
 
       const data = await response.json();